@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_scaling.py
+Scaling benchmarks of nuqasm2 on synthetic programs: each fails if the
+cost per op of a program FACTOR times as long grows more than MAX_RATIO
+times, i.e., if translation is no longer roughly linear in program size.
+Run as 'make bench' or 'python3 -m unittest discover -s benchmark -p "bench_*.py" -v'
+with NUQASM2_BENCH_SCALE multiplying program sizes (default 1).
+Timings are written to stderr.
+Copyright 2019 Jack Woehr jwoehr@softwoehr.com PO Box 51, Golden, CO 80402-0051.
+Apache-2.0 license -- See LICENSE which you should have received with this code.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+WITHOUT ANY EXPRESS OR IMPLIED WARRANTIES.
+"""
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+import nuqasm2 as nq
+from synthetic_qasm import write_program
+
+
+class TestScaling(unittest.TestCase):
+    """Per-op cost of translation stays roughly constant as programs grow"""
+
+    SCALE = float(os.getenv('NUQASM2_BENCH_SCALE', '1'))
+    BASE_OPS = max(100, int(2000 * SCALE))
+    FACTOR = 4
+    MAX_RATIO = 2.0
+    REPEATS = 3
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dirpath = tempfile.mkdtemp()
+        cls.programs = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dirpath)
+
+    def program(self, ops, **shape):
+        """Return filepath of synthetic program of ops ops and shape, written once"""
+        key = (ops,) + tuple(sorted(shape.items()))
+        if key not in self.programs:
+            subdir = tempfile.mkdtemp(dir=self.dirpath)
+            self.programs[key] = write_program(subdir, ops=ops, **shape)
+        return self.programs[key]
+
+    def best_time(self, prepare, run, filepath):
+        """Return least time of REPEATS runs of run(prepare(filepath))"""
+        best = None
+        for _ in range(self.REPEATS):
+            prepared = prepare(filepath)
+            gc.collect()
+            started = time.perf_counter()
+            run(prepared)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def assert_scales(self, name, prepare, run, **shape):
+        """
+        Time run(prepare(filepath)) on programs of BASE_OPS and
+        FACTOR * BASE_OPS ops of shape and compare cost per op
+        """
+        small_ops = self.BASE_OPS
+        large_ops = self.BASE_OPS * self.FACTOR
+        small = self.best_time(prepare, run, self.program(small_ops, **shape)) / small_ops
+        large = self.best_time(prepare, run, self.program(large_ops, **shape)) / large_ops
+        ratio = large / small
+        sys.stderr.write('\n{}: {:.2f} us/op at {} ops, {:.2f} us/op at {} ops, ratio {:.2f}\n'
+                         .format(name, small * 1e6, small_ops, large * 1e6, large_ops, ratio))
+        self.assertLess(ratio, self.MAX_RATIO,
+                        '{} per-op cost grew {:.2f} times from {} to {} ops'
+                        .format(name, ratio, small_ops, large_ops))
+
+    @staticmethod
+    def translator(filepath):
+        """Return QasmTranslator of filepath not yet run"""
+        return nq.QasmTranslator.fromFile(filepath, include_path=os.path.dirname(filepath),
+                                          include_cache=False)
+
+    @classmethod
+    def translation(cls, filepath):
+        """Return translation of filepath"""
+        qt = cls.translator(filepath)  # pylint: disable-msg=invalid-name
+        qt.translate()
+        return qt.get_translation()
+
+    @staticmethod
+    def ast2circ(translation):
+        """Generate circuit from translation"""
+        nq.Ast2Circ(nuq2_ast=translation).translate()
+
+    @staticmethod
+    def load(filepath):
+        """Load circuit from filepath"""
+        nq.load(filename=filepath, include_path=os.path.dirname(filepath))
+
+    def test_translate(self):
+        """QasmTranslator.translate() of flat program"""
+        self.assert_scales('translate', self.translator, nq.QasmTranslator.translate)
+
+    def test_translate_shaped(self):
+        """QasmTranslator.translate() of nested gates, includes and long expressions"""
+        self.assert_scales('translate shaped', self.translator, nq.QasmTranslator.translate,
+                           depth=4, includes=8, complexity=6)
+
+    def test_translate_wide(self):
+        """QasmTranslator.translate() of program on many qubits"""
+        self.assert_scales('translate wide', self.translator, nq.QasmTranslator.translate,
+                           qubits=512)
+
+    def test_ast2circ(self):
+        """Ast2Circ.translate() of flat program"""
+        self.assert_scales('ast2circ', self.translation, self.ast2circ)
+
+    def test_ast2circ_shaped(self):
+        """Ast2Circ.translate() of nested gates, includes and long expressions"""
+        self.assert_scales('ast2circ shaped', self.translation, self.ast2circ,
+                           depth=4, includes=8, complexity=6)
+
+    def test_ast2circ_wide(self):
+        """Ast2Circ.translate() of program on many qubits"""
+        self.assert_scales('ast2circ wide', self.translation, self.ast2circ, qubits=512)
+
+    def test_load(self):
+        """nuqasm2.load() of flat program"""
+        self.assert_scales('load', lambda filepath: filepath, self.load)
+
+    def test_load_shaped(self):
+        """nuqasm2.load() of nested gates, includes and long expressions"""
+        self.assert_scales('load shaped', lambda filepath: filepath, self.load,
+                           depth=4, includes=8, complexity=6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+synthetic_qasm.py
+Generate synthetic OPENQASM 2.0 programs of chosen shape for benchmarks
+Copyright 2019 Jack Woehr jwoehr@softwoehr.com PO Box 51, Golden, CO 80402-0051.
+Apache-2.0 license -- See LICENSE which you should have received with this code.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+WITHOUT ANY EXPRESS OR IMPLIED WARRANTIES.
+"""
+import argparse
+import os
+import random
+
+# Ops the body draws from which QuantumCircuit has, by number of params
+PRIMITIVE_OPS = (('h', 0), ('x', 0), ('cx', 0), ('rz', 1), ('u3', 3))
+
+
+def param_expression(rng, complexity):
+    """
+    Return a parameter expression of complexity binary operations
+    on constants and pi, e.g., 'pi/4' for 1
+    """
+    expression = 'pi' if rng.random() < 0.5 else str(rng.randint(1, 9))
+    for _ in range(complexity):
+        operator = rng.choice('+-*/')
+        operand = 'pi' if rng.random() < 0.25 else str(rng.randint(1, 9))
+        expression = expression + operator + operand
+    return expression
+
+
+def nested_gate_name(level):
+    """Return name of the user gate nested level deep"""
+    return 'nest' + str(level)
+
+
+def nested_gates(depth):
+    """
+    Return gate definitions nest1 .. nest<depth>, each but the first
+    applying the one below it, so nest<depth> unrolls depth levels deep
+    """
+    lines = []
+    for level in range(1, depth + 1):
+        if level == 1:
+            body = 'rz(theta) a; cx a,b;'
+        else:
+            body = nested_gate_name(level - 1) + '(theta) b,a; rz(theta) b;'
+        lines.append('gate ' + nested_gate_name(level) + '(theta) a,b { ' + body + ' }')
+    return lines
+
+
+def include_name(index):
+    """Return filename of the include file index"""
+    return 'synth_' + str(index) + '.inc'
+
+
+def include_gate_name(index):
+    """Return name of the gate defined by include file index"""
+    return 'inc' + str(index)
+
+
+def include_source(index):
+    """Return lines of include file index, which defines one gate"""
+    return ['// synthetic include ' + str(index),
+            'gate ' + include_gate_name(index) + ' a,b { h a; cx a,b; }']
+
+
+def synthesize(qubits=8, ops=1000, depth=0, complexity=1, includes=0, seed=0):  # pylint: disable-msg=too-many-arguments
+    """
+    Generate a synthetic program.
+
+    Parameters
+    ----------
+    qubits : int, optional
+        Size of the one qreg and creg, at least 2. The default is 8.
+    ops : int, optional
+        Number of op statements in the body. The default is 1000.
+    depth : int, optional
+        Nesting depth of user gates, 0 for none. When more than 0 every
+        fourth op applies the outermost gate. The default is 0.
+    complexity : int, optional
+        Binary operations in each parameter expression. The default is 1.
+    includes : int, optional
+        Number of include files, each defining a gate applied by the body
+        in turn with other ops. The default is 0.
+    seed : int, optional
+        Random seed, the same seed giving the same program. The default is 0.
+
+    Returns
+    -------
+    tuple
+        (list of lines of the program, dict of include filename to list of lines)
+
+    """
+    rng = random.Random(seed)
+    lines = ['OPENQASM 2.0;', '// synthetic program']
+    include_files = {}
+    for index in range(includes):
+        include_files[include_name(index)] = include_source(index)
+        lines.append('include "' + include_name(index) + '";')
+    lines += nested_gates(depth)
+    lines.append('qreg q[' + str(qubits) + '];')
+    lines.append('creg c[' + str(qubits) + '];')
+    for index in range(ops):
+        qubit_a, qubit_b = rng.sample(range(qubits), 2)
+        reg_a = 'q[' + str(qubit_a) + ']'
+        reg_b = 'q[' + str(qubit_b) + ']'
+        if depth and index % 4 == 0:
+            lines.append(nested_gate_name(depth) + '(' + param_expression(rng, complexity) +
+                         ') ' + reg_a + ',' + reg_b + ';')
+        elif includes and index % 4 == 1:
+            lines.append(include_gate_name(index // 4 % includes) + ' ' + reg_a + ',' + reg_b + ';')
+        else:
+            op, params = rng.choice(PRIMITIVE_OPS)
+            args = reg_a + ',' + reg_b if op == 'cx' else reg_a
+            if params:
+                op += '(' + ','.join(param_expression(rng, complexity)
+                                     for _ in range(params)) + ')'
+            lines.append(op + ' ' + args + ';')
+    lines.append('measure q -> c;')
+    return lines, include_files
+
+
+def write_program(dirpath, name='synth.qasm', **kwargs):
+    """
+    Write a program made by synthesize(**kwargs) and its include files
+    into directory dirpath.
+    Returns filepath of the program.
+    """
+    lines, include_files = synthesize(**kwargs)
+    for filename, include_lines in include_files.items():
+        with open(os.path.join(dirpath, filename), 'w') as file_handle:
+            file_handle.write('\n'.join(include_lines) + '\n')
+    filepath = os.path.join(dirpath, name)
+    with open(filepath, 'w') as file_handle:
+        file_handle.write('\n'.join(lines) + '\n')
+    return filepath
+
+
+if __name__ == '__main__':
+    PARSER = argparse.ArgumentParser(
+        description="Write a synthetic OPENQASM 2.0 program and its include files")
+    PARSER.add_argument("dirpath", help="Directory to which to write")
+    PARSER.add_argument("--name", action="store", default='synth.qasm',
+                        help="Filename of the program (default 'synth.qasm')")
+    PARSER.add_argument("--qubits", action="store", type=int, default=8,
+                        help="Size of the qreg and creg (default 8)")
+    PARSER.add_argument("--ops", action="store", type=int, default=1000,
+                        help="Number of ops in the body (default 1000)")
+    PARSER.add_argument("--depth", action="store", type=int, default=0,
+                        help="Nesting depth of user gates (default 0)")
+    PARSER.add_argument("--complexity", action="store", type=int, default=1,
+                        help="Binary operations in each parameter expression (default 1)")
+    PARSER.add_argument("--includes", action="store", type=int, default=0,
+                        help="Number of include files (default 0)")
+    PARSER.add_argument("--seed", action="store", type=int, default=0,
+                        help="Random seed (default 0)")
+    ARGS = PARSER.parse_args()
+    print(write_program(ARGS.dirpath, name=ARGS.name, qubits=ARGS.qubits, ops=ARGS.ops,
+                        depth=ARGS.depth, complexity=ARGS.complexity,
+                        includes=ARGS.includes, seed=ARGS.seed))
@@ -5,6 +5,12 @@ Created on Thu Feb 27 13:41:36 2020
 
 @author: jax
 """
-from .qasmast import QasmTranslator, Qasm_Exception
+from .qasmast import QasmTranslator, Qasm_Exception, materialize_source
+from .astcache import AstCache
+from .astfile import dump_ast, dumps_ast, load_ast, loads_ast, load_ast_file, AstFileException
+from .astfile import iter_ast_jsonl, dump_ast_jsonl, load_ast_jsonl
 from .ast2circ import Ast2Circ, Ast2CircException, Ast2CircOpNotFoundException
-from .load import load_from_string, load_from_file, load
+from .qasmexpr import ExpressionException
+from .incremental import IncrementalTranslator
+from .memprofile import profile_translate, profile_circuit, translation_memory
+from .load import load_from_string, load_from_file, load, load_many
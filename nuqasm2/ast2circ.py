@@ -7,14 +7,73 @@ Turns nuqasm2 ast into Qiskit QuantumCircuit
 """
 
 import ast
+from functools import lru_cache
 # import argparse
 import os
 import pprint
 import re
 import sys
+import time
+import weakref
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
-import numpy as np  # pylint: disable-msg=unused-import
+import qiskit.circuit
+from qiskit.circuit import Barrier, Gate, Measure, Qubit, Clbit
+from qiskit.circuit.exceptions import CircuitError
+import qiskit.circuit.library
 from .qasmast import ASTType, QasmTranslator
+from .qasmexpr import ExpressionException, compile_expression
+from .astfile import is_ast_file, load_ast_file, is_ast_jsonl_file, load_ast_jsonl
+
+
+# Ops appended as qiskit gates, by (op, number of params): the gate class
+# in qiskit.circuit.library (or qiskit.circuit) which the QuantumCircuit
+# method of the same name appends
+OP_GATE_CLASSES = {
+    ('h', 0): 'HGate', ('x', 0): 'XGate', ('y', 0): 'YGate', ('z', 0): 'ZGate',
+    ('s', 0): 'SGate', ('sdg', 0): 'SdgGate', ('t', 0): 'TGate', ('tdg', 0): 'TdgGate',
+    ('i', 0): 'IGate', ('id', 0): 'IGate', ('iden', 0): 'IGate',
+    ('cx', 0): 'CXGate', ('cnot', 0): 'CXGate', ('cy', 0): 'CYGate', ('cz', 0): 'CZGate',
+    ('ch', 0): 'CHGate', ('swap', 0): 'SwapGate', ('iswap', 0): 'iSwapGate',
+    ('dcx', 0): 'DCXGate', ('ccx', 0): 'CCXGate', ('toffoli', 0): 'CCXGate',
+    ('cswap', 0): 'CSwapGate', ('fredkin', 0): 'CSwapGate',
+    ('rccx', 0): 'RCCXGate', ('rcccx', 0): 'RC3XGate', ('reset', 0): 'Reset',
+    ('rx', 1): 'RXGate', ('ry', 1): 'RYGate', ('rz', 1): 'RZGate', ('u1', 1): 'U1Gate',
+    ('crx', 1): 'CRXGate', ('cry', 1): 'CRYGate', ('crz', 1): 'CRZGate',
+    ('cu1', 1): 'CU1Gate', ('rxx', 1): 'RXXGate', ('ryy', 1): 'RYYGate',
+    ('rzz', 1): 'RZZGate', ('rzx', 1): 'RZXGate',
+    ('u2', 2): 'U2Gate', ('r', 2): 'RGate',
+    ('u3', 3): 'U3Gate', ('cu3', 3): 'CU3Gate'}
+
+# Appended by QuantumCircuit.barrier(), the gate depending on the qubits
+BARRIER = ('barrier', 0)
+
+
+def _op_gates():
+    """
+    Return dispatch table of (op, number of params) to gate class, called
+    with the params to make a new gate for each op appended, as a gate
+    may be conditioned. Ops whose gate class this qiskit lacks are left out.
+    """
+    gates = {}
+    for key, class_name in OP_GATE_CLASSES.items():
+        gate_class = getattr(qiskit.circuit.library, class_name,
+                             getattr(qiskit.circuit, class_name, None))
+        if gate_class is not None:
+            gates[key] = gate_class
+    return gates
+
+
+OP_GATES = _op_gates()
+
+# Qubits each gate of OP_GATES is applied to
+OP_GATE_QUBITS = {key: gate(*[0.0] * key[1]).num_qubits for key, gate in OP_GATES.items()}
+
+# Does this qiskit keep a gate's definition as a list of (gate, qargs, cargs)
+# rather than as a QuantumCircuit?
+DEFINITION_IS_LIST = isinstance(qiskit.circuit.library.U2Gate(0.0, 0.0).definition, list)
+
+# Definitions of QasmGates kept, by GateBody and param values
+DEFINITION_CACHE_SIZE = 65536
 
 
 class ASTRegEx():  # pylint: disable-msg=too-few-public-methods
@@ -23,127 +82,380 @@ class ASTRegEx():  # pylint: disable-msg=too-few-public-methods
     ARGLIST = re.compile(r"\w*(.*)")
 
 
-class ASTBinder(dict):
-    """Bind reg list and param list w/r/t gate definition
+class ParamExpressions():
+    """
+    Param expressions of an op in a gate definition as a function of
+    the list of values of the gate's params returning the list of param
+    values of the op. Unlike a closure it can be pickled, e.g., with a
+    circuit of QasmGates.
     """
 
-    def __init__(self, gate_definition, reg_list=None, param_list=None):
+    __slots__ = ('names', 'expressions')
+
+    def __init__(self, names, expressions):
+        """
+        Parameters
+        ----------
+        names : tuple of strings
+            Names of the params of the gate definition.
+        expressions : tuple of Expression
+            Compiled param expressions of the op.
+
+        Returns
+        -------
+        None.
+
         """
-        This binds the params.
+        self.names = names
+        self.expressions = expressions
+
+    def __call__(self, values):
+        bindings = dict(zip(self.names, values))
+        return [expression.evaluate(bindings) for expression in self.expressions]
 
-        It may have a BUG!
+    def __getstate__(self):
+        return self.names, self.expressions
 
-        Do identical expansions match (and overwrite) different symbolic names?
+    def __setstate__(self, state):
+        self.names, self.expressions = state
 
+
+class GateTemplate():
+    """
+    Gate definition compiled once for expansion: the flat list of primitive
+    ops it expands to, with the ops of nested gate definitions inlined.
+    Each op is a tuple (op, slots, params), slots being indexes into the
+    reg list the gate is applied to and params either a tuple of floats
+    or a function of the list of values of the gate's params returning
+    the list of param values of the op.
+    """
+
+    __slots__ = ('op_sig', 'instructions', 'depth', 'gates', 'checked')
+
+    def __init__(self, op_sig, instructions, depth, gates, checked):  # pylint: disable-msg=too-many-arguments
+        """
         Parameters
         ----------
-        gate_definition : dict
-            nuqasm2 ast gate def.
-        reg_list : list, optional
-            list of c_sect code entry's registers, optional. The default is None.
-        param_list : list, optional
-            list of c_sect code entry's params, optional. The default is None.
+        op_sig : string
+            Signature of the gate definition, e.g., 'cu1/1'.
+        instructions : list
+            (op, slots, params) of the primitive ops.
+        depth : int
+            Nesting depth of gate definitions, 1 if no nested gates.
+        gates : dict
+            Per signature of this gate and each gate inlined, at any
+            depth, the list [expansions, instructions, max depth] of one
+            expansion of this gate.
+        checked : bool
+            True if each op has as many operands as its gate has qubits
+            and none twice, so expanding the gate onto distinct qubits
+            needs no further validation.
 
         Returns
         -------
         None.
 
         """
-        super(ASTBinder, self).__init__()
-        self.param_bind = {}
-        self.reg_bind = {}
-        gate_param_list = gate_definition.get('gate_param_list')
-        if gate_param_list:
-            for i in range(0, len(gate_param_list)):  # pylint: disable-msg=consider-using-enumerate
-                # self.param_bind.update({gate_param_list[i]: param_list[i]})
-                self.param_bind.update({param_list[i]: gate_param_list[i]}) # bind backwards!
-        gate_reg_list = gate_definition.get('gate_reg_list')
-        if gate_reg_list:
-            for i in range(0, len(gate_reg_list)):  # pylint: disable-msg=consider-using-enumerate
-                self.reg_bind.update({gate_reg_list[i]: reg_list[i]})
+        self.op_sig = op_sig
+        self.instructions = instructions
+        self.depth = depth
+        self.gates = gates
+        self.checked = checked
 
-    def param_binding(self, gate_param_name):
+    @staticmethod
+    def compile_params(param_list, gate_param_list):
         """
-        Return real param value for symbolic param name from gate definition.
-
+        Compile the param expressions of an op in a gate definition.
 
         Parameters
         ----------
-        gate_param_name : string
-            symbolic param name from g_sect gate def.
+        param_list : list of strings
+            Param expressions of the op.
+        gate_param_list : list of strings
+            Names of the params of the gate definition.
+
+        Raises
+        ------
+        ExpressionException
+            If an expression can't be parsed.
 
         Returns
         -------
-        Actual param value passed by caller of gate definition .
+        tuple or ParamExpressions
+            Tuple of float values if no expression names a param,
+            else function of the list of values of the gate's params.
 
         """
-        return self.param_bind.get(gate_param_name)
+        expressions = [compile_expression(param) for param in param_list]
+        if all(expression.function is None for expression in expressions):
+            return tuple(expression.value for expression in expressions)
+        return ParamExpressions(tuple(gate_param_list), tuple(expressions))
 
-    def reg_binding(self, gate_reg_name):
+    @staticmethod
+    def compose_params(inner, outer):
         """
-        Return real reg name for symbolic reg name from gate definition.
+        Compose params of an op of a nested gate definition with the
+        params with which the enclosing definition applies that gate.
 
         Parameters
         ----------
-        gate_reg_name : string
-            symbolic reg name from g_sect gate def.
+        inner : tuple or function
+            Params of the op as compiled in the nested gate.
+        outer : tuple or function
+            Params the enclosing gate passes to the nested gate.
 
         Returns
         -------
-        Actual reg passed by caller of gate defintion.
+        tuple or function
+            Params of the op as a function of the enclosing gate's params,
+            or a tuple of float if they don't depend on them.
 
         """
-        return self.reg_bind.get(gate_reg_name)
+        if not callable(inner):
+            return inner
+        if not callable(outer):
+            return tuple(inner(outer))
+        return lambda values: inner(outer(values))
 
-    def bind_regs(self, reg_list):
-        """
-        Return list of real reg names for list symbolic reg names from gate definition.
 
+class GateBody():
+    """
+    Gate definition compiled for Ast2Circ(unroll=False), ops not inlined.
+    Each op is a tuple (op, slots, params, inner), slots and params as
+    in GateTemplate and inner the GateBody of the gate definition the op
+    applies, or None if the op is a qiskit gate.
+    Bodies of identical definitions are one and the same GateBody,
+    so the definitions built from them are cached across circuits.
+    """
+
+    __slots__ = ('name', 'num_qubits', 'ops', 'size', '__weakref__')
+
+    _BODIES = weakref.WeakValueDictionary()
+
+    def __init__(self, name, num_qubits, ops):
+        """
         Parameters
         ----------
-        reg_list : list
-            list of symbolic reg names used in gate definition.
+        name : string
+            Name of the gate defined.
+        num_qubits : int
+            Number of regs of the gate definition.
+        ops : list
+            (op, slots, params, inner) of its ops.
+
+        Attributes
+        ----------
+        size : int
+            Number of primitive instructions the definition unrolls to.
 
         Returns
         -------
-        b_list : list
-            list of actual reg values from caller of gate definition.
+        None.
 
         """
-        b_list = None
-        if reg_list:
-            b_list = []
-            for reg in reg_list:
-                b_list.append(self.reg_binding(reg))
-        return b_list
+        self.name = name
+        self.num_qubits = num_qubits
+        self.ops = ops
+        self.size = sum(1 if inner is None else inner.size for _, _, _, inner in ops)
 
-    def bind_params(self, param_list):
+    @classmethod
+    def shared(cls, key, name, num_qubits, ops):
         """
-        Return list of symbolic param names from gate definition
-        that correspond to the runtime params that are provided.
+        Return the GateBody of the definition identified by key, made
+        of name, num_qubits and ops the first time key is seen.
+        key is hashable and identifies the definition by its source,
+        including the bodies of the definitions it applies.
+        """
+        body = cls._BODIES.get(key)
+        if body is None:
+            body = cls._BODIES[key] = cls(name, num_qubits, ops)
+        return body
+
 
+class QasmGate(Gate):
+    """
+    Qiskit Gate of an OPENQASM gate definition applied with param values,
+    its definition built from its GateBody when first asked for.
+    Each op appended gets its own QasmGate, as it may be conditioned;
+    the rules of its definition are cached by GateBody and param values.
+    """
+
+    def __init__(self, body, params):
+        """
         Parameters
         ----------
-        param_list : list
-            list of symbolic param names used in gate definition.
+        body : GateBody
+            The compiled gate definition.
+        params : tuple
+            float values of the gate's params.
 
         Returns
         -------
-        b_list : list
-            list of actual param values from caller of gate definition.
+        None.
 
+        """
+        super(QasmGate, self).__init__(body.name, body.num_qubits, list(params))
+        self.body = body
+
+    def _define(self):
+        """Define gate by the cached rules of its gate body and param values"""
+        qreg, rules = definition_rules(self.body, tuple(self.params))
+        if DEFINITION_IS_LIST:
+            self.definition = list(rules)
+        else:
+            definition = QuantumCircuit(qreg, name=self.name)
+            for rule in rules:
+                definition.append(*rule)
+            self.definition = definition
+
+
+@lru_cache(maxsize=DEFINITION_CACHE_SIZE)
+def definition_rules(body, params):
+    """
+    Return (register, tuple of (gate, qubits, clbits)) of the definition
+    of a GateBody applied with a tuple of float param values, built once
+    and cached thereafter.
+    """
+    qreg = QuantumRegister(body.num_qubits, 'q')
+    rules = []
+    for the_op, slots, op_params, inner in body.ops:
+        if callable(op_params):
+            op_params = op_params(params)
+        if inner is not None:
+            gate = QasmGate(inner, tuple(op_params))
+        else:
+            gate = OP_GATES.get((the_op, len(op_params)))
+            gate = Barrier(len(slots)) if gate is None else gate(*op_params)
+        rules.append((gate, [qreg[slot] for slot in slots], []))
+    return qreg, tuple(rules)
 
+
+class UnrollAnalytics():
+    """
+    Expansion analytics collected by Ast2Circ(analytics=True): for each
+    source op and each gate signature unrolled, the primitive instructions
+    appended to the circuit, the greatest nesting depth of gate definitions
+    expanded, and the time taken.
+    """
+
+    def __init__(self):
         """
-        b_list = None
-        if param_list:
-            b_list = []
-            for param in param_list:
-                bound_param = self.param_binding(param)
-                # DEBUG
-                # print("******bound_param {} param {} b_list {}".format(bound_param, param, b_list))  # pylint: disable-msg=line-too-long
-                # END-DEBUG
-                b_list.append(bound_param if bound_param else param)
-        return b_list
+        Nothing recorded yet.
+
+        Attributes
+        ----------
+        ops : list
+            One tuple per source op, (filenum, linenum, op signature,
+            'easy', 'unroll' or 'composite', instructions, max depth, seconds).
+        gates : dict
+            Per gate signature unrolled, at any depth, the list
+            [expansions, instructions, max depth, seconds], where
+            instructions and seconds include those of nested gates.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.ops = []
+        self.gates = {}
+        self.deepest = 0
+        self.composite = False
+        self.op_start = None
+
+    def start_op(self, size):
+        """Start recording a source op about to be appended to circuit of size instructions"""
+        self.deepest = 0
+        self.composite = False
+        self.op_start = (size, time.perf_counter())
+
+    def composite_op(self):
+        """Record that the source op is being appended as a composite gate, not unrolled"""
+        self.composite = True
+
+    def end_op(self, entry, op_sig, size):
+        """Record a source op appended since start_op(), circuit now of size instructions"""
+        start_size, started = self.op_start
+        if self.composite:
+            path = 'composite'
+        else:
+            path = 'unroll' if self.deepest else 'easy'
+        self.ops.append((entry.get('filenum'), entry.get('linenum'), op_sig, path,
+                         size - start_size, self.deepest,
+                         time.perf_counter() - started))
+
+    def start_gate(self, size):
+        """
+        Start recording a gate template about to be expanded into circuit
+        of size instructions.
+        Returns state to be passed to end_gate().
+        """
+        return size, time.perf_counter()
+
+    def end_gate(self, template, size, state):
+        """
+        Record a gate template expanded since start_gate(), circuit now of
+        size instructions, and the gates inlined in it, whose time is
+        apportioned by the instructions they expand to.
+        """
+        start_size, started = state
+        seconds = time.perf_counter() - started
+        instructions = size - start_size
+        self.deepest = max(self.deepest, template.depth)
+        for op_sig, (expansions, count, nesting) in template.gates.items():
+            record = self.gates.get(op_sig)
+            if record is None:
+                record = self.gates[op_sig] = [0, 0, 0, 0.0]
+            if op_sig == template.op_sig:
+                count = instructions
+                share = seconds
+            else:
+                share = seconds * count / len(template.instructions)
+            record[0] += expansions
+            record[1] += count
+            record[2] = max(record[2], nesting)
+            record[3] += share
+
+    def report(self, top=10):
+        """
+        Summarize the analytics.
+
+        Parameters
+        ----------
+        top : int, optional
+            Number of source ops listed, those producing the most
+            instructions, or None for all in source order. The default is 10.
+
+        Returns
+        -------
+        dict
+            Totals over all source ops, 'gates' keyed by gate signature
+            in order of instructions produced, and 'ops' listed.
+
+        """
+        ops = [{'filenum': filenum, 'linenum': linenum, 'op': op_sig, 'path': path,
+                'instructions': instructions, 'max_depth': max_depth, 'time': seconds}
+               for filenum, linenum, op_sig, path, instructions, max_depth, seconds
+               in self.ops]
+        if top is not None:
+            ops = sorted(ops, key=lambda op: op['instructions'], reverse=True)[:top]
+        gates = {}
+        for op_sig, (expansions, instructions, max_depth, seconds) in sorted(
+                self.gates.items(), key=lambda item: item[1][1], reverse=True):
+            gates[op_sig] = {'expansions': expansions, 'instructions': instructions,
+                             'max_depth': max_depth, 'time': seconds}
+        unrolled = [op for op in self.ops if op[3] == 'unroll']
+        composite = sum(1 for op in self.ops if op[3] == 'composite')
+        return {'source_ops': len(self.ops),
+                'easy': len(self.ops) - len(unrolled) - composite,
+                'unrolled': len(unrolled),
+                'composite': composite,
+                'instructions': sum(op[4] for op in self.ops),
+                'unrolled_instructions': sum(op[4] for op in unrolled),
+                'max_depth': max((op[5] for op in self.ops), default=0),
+                'time': sum(op[6] for op in self.ops),
+                'gates': gates,
+                'ops': ops}
 
 
 class Ast2Circ():
@@ -153,7 +465,10 @@ class Ast2Circ():
                  nuq2_ast=None,
                  circuit=None,
                  stream=sys.stdout,
-                 loading_from_file=False):
+                 loading_from_file=False,
+                 analytics=False,
+                 bulk=False,
+                 unroll=True):
         """
         Initialize instance
 
@@ -169,6 +484,23 @@ class Ast2Circ():
         loading_from_file : bool, optional
             DESCRIPTION. Are we loading a text representation of the AST?
             The default is False.
+        analytics : bool, optional
+            DESCRIPTION. Collect an UnrollAnalytics in self.analytics
+            of how far each op expands. The default is False.
+        bulk : bool, optional
+            DESCRIPTION. Collect the instructions of the ops appended and
+            add them to the circuit's data all at once, validating the
+            operands of each distinct op once and of each gate template
+            when compiled rather than per instruction. Ignored if the
+            circuit's data is not a plain list, as in some qiskit versions.
+            The default is False.
+        unroll : bool, optional
+            DESCRIPTION. Expand ops applying gate definitions into the
+            qiskit gates the definitions come down to. If False, append
+            instead a QasmGate per op, whose definition is only built when
+            asked for and is cached for all ops and circuits applying the
+            same gate definition with the same param values.
+            The default is True.
 
         Returns
         -------
@@ -181,7 +513,20 @@ class Ast2Circ():
         self.loading_from_file = loading_from_file
         self.spool = None
         self.gatedefs = {}
+        self.templates = {}
+        self.bodies = {}
         self.regdefs = []
+        self.qregs_by_name = None
+        self.cregs_by_name = None
+        self.qubits_by_index = None
+        self.clbits_by_index = None
+        self.quantum_operands = None
+        self.classical_operands = None
+        self.analytics = UnrollAnalytics() if analytics else None
+        self.bulk = bulk
+        self.unroll = unroll
+        self.bulk_data = None
+        self.broadcasts = {}
         self.pp = pprint.PrettyPrinter(indent=4, stream=stream)   # pylint: disable-msg=invalid-name
 
     @staticmethod
@@ -238,6 +583,8 @@ class Ast2Circ():
             arglist = arglist_match.group(1)
             arity = 0 if len(arglist) == 0 else len(arglist.split(','))
             self.gatedefs[self._op_sig(op, arity)] = gatedef
+        self.templates = {}  # Definitions may have changed
+        self.bodies = {}
 
     def _create_quantum_circuit(self):
         """
@@ -256,238 +603,467 @@ class Ast2Circ():
         self.circuit = QuantumCircuit(*reg_list)
         return self.circuit
 
-    @staticmethod
-    def _string_reg_to_reg(reg_name, qregs, cregs):
+    def _index_registers(self):
         """
-        Nuqasm2 AST keeps register/bit operands as string.
-        We must convert to actual reg.
-
-        Parameters
-        ----------
-        reg_name : string
-            Name of sought register
-        qregs : list of QuantumRegister
-            Seek reg here
-        cregs : list of ClassicalRegister
-            Seek reg here
-        Returns
-        -------
-        Actual reg
-
+        Map the names of the circuit's registers to the registers, and
+        (register name, index) to the bits, so operands are found in
+        constant time however many qubits the circuit has.
         """
-
-        reg = None
-        if qregs:
-            for r in qregs:  # pylint: disable-msg=invalid-name
-                if r.name == reg_name:
-                    reg = r
-                    break
-        if not reg:
-            if cregs:
-                for r in cregs:  # pylint: disable-msg=invalid-name
-                    if r.name == reg_name:
-                        reg = r
-                        break
-        return reg
+        self.qregs_by_name = {}
+        self.cregs_by_name = {}
+        self.qubits_by_index = {}
+        self.clbits_by_index = {}
+        self.quantum_operands = {}
+        self.classical_operands = {}
+        for registers, bits, regs in ((self.qregs_by_name, self.qubits_by_index,
+                                       self.circuit.qregs),
+                                      (self.cregs_by_name, self.clbits_by_index,
+                                       self.circuit.cregs)):
+            for reg in regs:
+                registers[reg.name] = reg
+                for index in range(reg.size):
+                    bits[(reg.name, index)] = reg[index]
 
     @staticmethod
-    def _string_reg_to_bit(string_reg, qubits, clbits):
+    def _resolve_operand(string_reg, registers, bits):
         """
         Nuqasm2 AST keeps register/bit operands as string.
-        We must convert to actual bit.
+        We must convert to actual reg or bit.
 
         Parameters
         ----------
-        circuit : QuantumCircuit(regs)
-            Circuit to which the name reg belongs
         string_reg : string
             String representation of the reg/bit.
-        qubits: list
-            Individual qubits pertaining to circuit
-        clbits: list
-            Individual clbits pertaining to circuit
+        registers : dict
+            Registers by name.
+        bits : dict
+            Bits by (register name, index).
+
         Returns
         -------
-        Actual bit
-
-        """
-        the_split = string_reg.split('[')
-        reg_name = the_split[0]
-        num = int(the_split[1].strip('[]'))
-        bit = None
-
-        if qubits:
-            for b in qubits:  # pylint: disable-msg=invalid-name
-                if b.register.name == reg_name:
-                    if b.index == num:
-                        bit = b
-                        break
-        if not bit:
-            if clbits:
-                for b in clbits:  # pylint: disable-msg=invalid-name
-                    if b.register.name == reg_name:
-                        if b.index == num:
-                            bit = b
-                            break
-
-        return bit
+        Actual reg or bit, or None if there is none such.
+
+        """
+        if string_reg.find('[') >= 0:
+            the_split = string_reg.split('[')
+            return bits.get((the_split[0], int(the_split[1].strip('[]'))))
+        return registers.get(string_reg)
+
+    def _quantum_operand(self, string_reg):
+        """Return quantum reg or bit of operand string, or None"""
+        operand = self.quantum_operands.get(string_reg)
+        if operand is None:
+            operand = self._resolve_operand(string_reg, self.qregs_by_name,
+                                            self.qubits_by_index)
+            if operand is not None:
+                self.quantum_operands[string_reg] = operand
+        return operand
+
+    def _classical_operand(self, string_reg):
+        """Return classical reg or bit of operand string, or None"""
+        operand = self.classical_operands.get(string_reg)
+        if operand is None:
+            operand = self._resolve_operand(string_reg, self.cregs_by_name,
+                                            self.clbits_by_index)
+            if operand is not None:
+                self.classical_operands[string_reg] = operand
+        return operand
 
     @staticmethod
-    def _do_the_math(a_list):
+    def _evaluate_params(param_list, bindings=None):
         """
-        substitute known string names of transcendentals with numpy equivs
-        and do the math.
+        Evaluate parameter expressions, each compiled once and cached.
 
         Parameters
         ----------
-        a_list : list of strings
-            list of strings which may contain string names of transcendentals.
+        param_list : list of strings
+            OPENQASM 2.0 parameter expressions.
+        bindings : dict, optional
+            Values of the parameters of a gate definition by name.
+            The default is None.
+
+        Raises
+        ------
+        ExpressionException
+            If an expression can't be parsed or evaluated.
 
         Returns
         -------
-        a_list : list
-            the input list modified
+        list
+            float values.
 
         """
-        b_list = []
-        for i in a_list:
-            i = i.replace('pi', "np.pi")
-            # ...
-            i = str(eval(i))  # pylint: disable-msg=eval-used
-            b_list.append(i)
-        return b_list
+        return [compile_expression(param).evaluate(bindings) for param in param_list]
 
-    def _op_append(self, entry, qregs, cregs, qubits, clbits):  # pylint: disable-msg=too-many-arguments, line-too-long
+    def _op_append(self, entry):
         """
         Append operation to circuit
+
+        Returns
+        -------
+        int
+            Number of instructions added, 0 if the op wasn't found.
+
         """
 
-        string_reg_list = entry.get('reg_list')
         reg_list = []
-        for string_reg in string_reg_list:
-            if string_reg.find('[') >= 0:
-                reg_list.append(self._string_reg_to_bit(string_reg, qubits, clbits))
-            else:
-                reg_list.append(self._string_reg_to_reg(string_reg, qregs, cregs))
+        for string_reg in entry.get('reg_list'):
+            operand = self._quantum_operand(string_reg)
+            if operand is None:
+                operand = self._classical_operand(string_reg)
+            reg_list.append(operand)
 
         param_list = entry.get('param_list')
         if param_list:
-            param_list = self._do_the_math(param_list)
+            param_list = self._evaluate_params(param_list)
 
-        if not self._op_easy(entry.get('op'),
-                             reg_list,
-                             param_list=param_list if param_list else None):
-            self._op_search(entry.get('op'),
-                            reg_list,
-                            param_list=param_list if param_list else None)
+        added = self._op_easy(entry.get('op'),
+                              reg_list,
+                              param_list=param_list if param_list else None)
+        if added is None:
+            added = self._op_search(entry.get('op'),
+                                    reg_list,
+                                    param_list=param_list if param_list else None)
+        return added
+
+    @staticmethod
+    def _is_easy(op, arity):  # pylint: disable-msg=invalid-name
+        """Is op with arity params appended as a qiskit gate?"""
+        return (op, arity) in OP_GATES or (op, arity) == BARRIER
 
     def _op_easy(self, op, reg_list, param_list=None):  # pylint: disable-msg=invalid-name
         """
-        Append operation to circuit where op is known to QuantumCircuit class
+        Append operation to circuit where op is a qiskit gate in OP_GATES,
+        or barrier
 
         Returns
         -------
-        True IFF QuantumCircuit has this op
+        int or None
+            Number of instructions added, None IFF op with this many params
+            is not a qiskit gate.
 
         """
 
-        has_op = hasattr(self.circuit, op)
+        gate = OP_GATES.get((op, len(param_list) if param_list else 0))
 
-        if has_op:
-            if param_list:
-                # DEBUG
-                # print("********** op {} param_list {} reg_list {}".format(op, param_list, reg_list))  # pylint: disable-msg=line-too-long
-                # END-DEBUG
-                getattr(self.circuit, op)(*param_list, *reg_list)
-            else:
-                getattr(self.circuit, op)(*reg_list)
+        if gate is not None:
+            # DEBUG
+            # print("********** op {} param_list {} reg_list {}".format(op, param_list, reg_list))  # pylint: disable-msg=line-too-long
+            # END-DEBUG
+            return self._append_gate(gate(*param_list) if param_list else gate(), reg_list)
+        if op == BARRIER[0] and not param_list:
+            return self._barrier(reg_list)
+        return None
+
+    def _barrier(self, reg_list):
+        """Append barrier across reg list to circuit, returning instructions added"""
+        if self.bulk_data is None:
+            return len(self.circuit.barrier(*reg_list))
+        width = sum(reg.size if isinstance(reg, QuantumRegister) else 1
+                    for reg in reg_list)
+        return self._append_gate(Barrier(width), reg_list)
+
+    def _append_gate(self, gate, qargs, cargs=()):
+        """
+        Append gate applied to qargs and cargs to circuit, or in bulk
+        mode collect its instructions, broadcast as by QuantumCircuit.append().
+        Returns number of instructions added.
+        """
+        if self.bulk_data is None:
+            return len(self.circuit.append(gate, qargs, cargs))
+        broadcast = self._broadcast(gate, qargs, cargs)
+        for qarg, carg in broadcast:
+            self.bulk_data.append((gate, qarg, carg))
+        return len(broadcast)
+
+    def _broadcast(self, gate, qargs, cargs):
+        """
+        Return list of (qubits, clbits) of each instruction of gate applied
+        to qargs and cargs, which may be registers, validated as by
+        QuantumCircuit.append() when first seen and cached thereafter.
+
+        Raises
+        ------
+        CircuitError
+            If the operands are not bits of the circuit or don't fit the gate.
 
-        return has_op
+        """
+        key = (gate.name, gate.num_qubits, gate.num_clbits, tuple(qargs), tuple(cargs))
+        broadcast = self.broadcasts.get(key)
+        if broadcast is None:
+            broadcast = list(gate.broadcast_arguments(
+                [self._expand_operand(qarg, Qubit, QuantumRegister) for qarg in qargs],
+                [self._expand_operand(carg, Clbit, ClassicalRegister) for carg in cargs]))
+            for qarg, _ in broadcast:
+                if len(set(qarg)) != len(qarg):
+                    raise CircuitError("duplicate qubit arguments")
+            self.broadcasts[key] = broadcast
+        return broadcast
 
-    def _barrier_append(self, entry, qregs, qubits):
+    @staticmethod
+    def _expand_operand(operand, bit_type, register_type):
+        """
+        Return list of the bits of an operand resolved from this circuit's
+        registers, a bit or a register, raising CircuitError if it's neither
+        """
+        if isinstance(operand, bit_type):
+            return [operand]
+        if isinstance(operand, register_type):
+            return operand[:]
+        raise CircuitError("{} is not a {} or {}".format(operand, bit_type.__name__,
+                                                           register_type.__name__))
+
+    def _instruction_count(self):
+        """Instructions in circuit, and in bulk mode those collected to be added"""
+        return len(self.circuit) + (len(self.bulk_data) if self.bulk_data is not None else 0)
+
+    def _start_bulk(self):
+        """Start collecting instructions if in bulk mode and circuit allows"""
+        if self.bulk and isinstance(getattr(self.circuit, '_data', None), list):
+            self.bulk_data = []
+
+    def _end_bulk(self):
+        """Add the instructions collected in bulk mode to the circuit's data"""
+        if self.bulk_data:
+            self.circuit._data.extend(self.bulk_data)  # pylint: disable-msg=protected-access
+        self.bulk_data = None
+
+    def _barrier_append(self, entry):
         """
         Append barrier to circuit
         """
 
-        string_reg_list = entry.get('reg_list')
-        reg_list = []
-        for string_reg in string_reg_list:
-            if string_reg.find('[') >= 0:
-                reg_list.append(self._string_reg_to_bit(string_reg, qubits, None))
-            else:
-                reg_list.append(self._string_reg_to_reg(string_reg, qregs, None))
+        reg_list = [self._quantum_operand(string_reg) for string_reg in entry.get('reg_list')]
 
-        getattr(self.circuit, 'barrier')(*reg_list)
+        self._barrier(reg_list)
 
-    def _measure_append(self, entry, qregs, cregs, qubits, clbits):  # pylint: disable-msg=too-many-arguments, line-too-long
+    def _measure_append(self, entry):
         """
         Append measure to circuit
         """
-        source_reg = entry.get('source_reg')
-        target_reg = entry.get('target_reg')
-        reg_list = []
-
-        if source_reg.find('[') >= 0:
-            reg_list.append(self._string_reg_to_bit(source_reg, qubits, None))
-        else:
-            reg_list.append(self._string_reg_to_reg(source_reg, qregs, None))
 
-        if target_reg.find('[') >= 0:
-            reg_list.append(self._string_reg_to_bit(target_reg, None, clbits))
+        source = self._quantum_operand(entry.get('source_reg'))
+        target = self._classical_operand(entry.get('target_reg'))
+        if self.bulk_data is None:
+            self.circuit.measure(source, target)
         else:
-            reg_list.append(self._string_reg_to_reg(target_reg, None, cregs))
-
-        getattr(self.circuit, 'measure')(*reg_list)
+            self._append_gate(Measure(), [source], [target])
 
     def _unrollable(self, op_sig):
         """Does a op signature exist in the gate section?"""
         return self.gatedefs.get(op_sig)
 
-    def _unroll(self, gate_definition, reg_list, param_list=None):  # pylint: disable-msg=invalid-name, line-too-long
-        """Expand a gate definition"""
-        ast_binder = ASTBinder(gate_definition, reg_list, param_list)
+    def _template(self, op_sig, compiling=()):
+        """
+        Return the GateTemplate of the gate definition of op signature,
+        compiled on first use, or None if there is no such definition.
+        compiling is the signatures of the definitions being compiled
+        which inline this one.
+        """
+        template = self.templates.get(op_sig)
+        if template is None:
+            gate_definition = self._unrollable(op_sig)
+            if gate_definition:
+                template = self._compile_template(op_sig, gate_definition, compiling)
+                self.templates[op_sig] = template
+        return template
+
+    @staticmethod
+    def _compile_gate_ops(op_sig, gate_definition, compiling):
+        """
+        Compile the ops of a gate definition
+
+        Raises
+        ------
+        Ast2CircTranslationException
+            If the definition applies itself or uses a reg it doesn't declare.
+        ExpressionException
+            If a param expression can't be parsed.
+
+        Returns
+        -------
+        list
+            (op, slots, param expressions, params) of each op, slots and
+            params as in GateTemplate.
+
+        """
+        if op_sig in compiling:
+            raise Ast2CircTranslationException(section='g_sect', entry=gate_definition,
+                                               message='Gate definition applies itself')
+        gate_param_list = gate_definition.get('gate_param_list') or []
+        slot_of = {reg: slot
+                   for slot, reg in enumerate(gate_definition.get('gate_reg_list') or [])}
+        gate_ops = []
         for gate_op in gate_definition.get('gate_ops_list'):
-            the_op = gate_op.get('op')
-            the_reg_list = ast_binder.bind_regs(gate_op.get('op_reg_list'))
-            the_param_list = None
-            gate_op_param_list = gate_op.get('op_param_list')
-            if gate_op_param_list:  # Have to subst in the full param for symbolic name.
-                the_param_list = []
-                param_symbolic_names = ast_binder.bind_params(param_list)
-                # DEBUG
-                # print('gate_op_param_list: {}'.format(str(gate_op_param_list)))
-                # print(param_symbolic_names)
-                # EMD=DEBUG
-                for i in range(0, len(gate_op_param_list)):
-                    if param_symbolic_names:
-                        the_param_list.append(gate_op_param_list[i].replace(param_symbolic_names[i],
-                                                                            param_list[i]))
-                    else:
-                        if gate_op_param_list:
-                            the_param_list.append(gate_op_param_list[i])
-            # DEBUG
-            # print("******the_op {} the_reg_list {} the_param_list {}".format(the_op, the_reg_list, the_param_list))  # pylint: disable-msg=line-too-long
-            # END-DEBUG
-            if not self._op_easy(the_op,
-                                 the_reg_list,
-                                 param_list=the_param_list if the_param_list else None):
-                self._op_search(the_op,
-                                the_reg_list,
-                                param_list=the_param_list if the_param_list else None)
+            try:
+                slots = tuple(slot_of[reg] for reg in gate_op.get('op_reg_list') or [])
+            except KeyError as ex:
+                raise Ast2CircTranslationException(section='g_sect', entry=gate_definition,
+                                                   message='Undeclared reg ' + str(ex))
+            gate_op_param_list = gate_op.get('op_param_list') or []
+            gate_ops.append((gate_op.get('op'), slots, gate_op_param_list,
+                             GateTemplate.compile_params(gate_op_param_list, gate_param_list)))
+        return gate_ops
+
+    def _compile_template(self, op_sig, gate_definition, compiling):
+        """
+        Compile a gate definition into a GateTemplate
+
+        Raises
+        ------
+        Ast2CircTranslationException
+            If the definition applies itself or uses a reg it doesn't declare.
+        ExpressionException
+            If a param expression can't be parsed or evaluated.
+
+        Returns
+        -------
+        GateTemplate
+            The compiled definition.
+
+        """
+        gate_ops = self._compile_gate_ops(op_sig, gate_definition, compiling)
+        compiling = compiling + (op_sig,)
+        instructions = []
+        depth = 1
+        gates = {}
+        checked = True
+        for the_op, slots, gate_op_param_list, params in gate_ops:
+            if self._is_easy(the_op, len(gate_op_param_list)):
+                instructions.append((the_op, slots, params))
+                checked = (checked and len(set(slots)) == len(slots) and
+                           OP_GATE_QUBITS.get((the_op, len(gate_op_param_list)),
+                                              len(slots)) == len(slots))
+                continue
+            inner = self._template(self._op_sig(the_op, len(gate_op_param_list)), compiling)
+            if inner is None:  # Nothing to expand, as before templates
+                continue
+            checked = checked and inner.checked and len(set(slots)) == len(slots)
+            for inner_op, inner_slots, inner_params in inner.instructions:
+                instructions.append((inner_op,
+                                     tuple(slots[slot] for slot in inner_slots),
+                                     GateTemplate.compose_params(inner_params, params)))
+            depth = max(depth, inner.depth + 1)
+            for inner_sig, (expansions, count, nesting) in inner.gates.items():
+                record = gates.setdefault(inner_sig, [0, 0, 0])
+                record[0] += expansions
+                record[1] += count
+                record[2] = max(record[2], nesting)
+        gates[op_sig] = [1, len(instructions), depth]
+        return GateTemplate(op_sig, instructions, depth, gates, checked)
+
+    def _gate_body(self, op_sig, compiling=()):
+        """
+        Return the GateBody of the gate definition of op signature,
+        compiled on first use, or None if there is no such definition.
+        compiling is the signatures of the definitions being compiled
+        which apply this one.
+        """
+        body = self.bodies.get(op_sig)
+        if body is None:
+            gate_definition = self._unrollable(op_sig)
+            if gate_definition:
+                body = self._compile_body(op_sig, gate_definition, compiling)
+                self.bodies[op_sig] = body
+        return body
+
+    def _compile_body(self, op_sig, gate_definition, compiling):
+        """
+        Compile a gate definition into a GateBody
+
+        Raises
+        ------
+        Ast2CircTranslationException
+            If the definition applies itself or uses a reg it doesn't declare.
+        ExpressionException
+            If a param expression can't be parsed or evaluated.
+
+        Returns
+        -------
+        GateBody
+            The compiled definition, shared with identical definitions.
+
+        """
+        gate_ops = self._compile_gate_ops(op_sig, gate_definition, compiling)
+        compiling = compiling + (op_sig,)
+        ops = []
+        key_ops = []
+        for the_op, slots, gate_op_param_list, params in gate_ops:
+            inner = None
+            if not self._is_easy(the_op, len(gate_op_param_list)):
+                inner = self._gate_body(self._op_sig(the_op, len(gate_op_param_list)),
+                                        compiling)
+                if inner is None or not inner.size:  # Nothing to expand, as when unrolling
+                    continue
+            ops.append((the_op, slots, params, inner))
+            key_ops.append((the_op, slots, tuple(gate_op_param_list), inner))
+        gate_reg_list = gate_definition.get('gate_reg_list') or []
+        key = (op_sig, len(gate_reg_list),
+               tuple(gate_definition.get('gate_param_list') or []), tuple(key_ops))
+        return GateBody.shared(key, op_sig.split('/')[0], len(gate_reg_list), ops)
+
+    def _unroll(self, template, reg_list, param_list=None):
+        """
+        Expand a gate template applied to reg list with param values.
+        Returns number of instructions added.
+        """
+        if (self.bulk_data is not None and template.checked and
+                len(set(reg_list)) == len(reg_list) and
+                all(isinstance(reg, Qubit) for reg in reg_list)):
+            self._unroll_bulk(template, reg_list, param_list)
+            return len(template.instructions)
+        added = 0
+        for the_op, slots, params in template.instructions:
+            if callable(params):
+                params = params(param_list)
+            added += self._op_easy(the_op,
+                                   [reg_list[slot] for slot in slots],
+                                   param_list=params if params else None)
+        return added
+
+    def _unroll_bulk(self, template, qubits, param_list=None):
+        """
+        Collect the instructions of a checked gate template applied to
+        distinct qubits, which need no validation
+        """
+        bulk_data = self.bulk_data
+        for the_op, slots, params in template.instructions:
+            if callable(params):
+                params = params(param_list)
+            gate = OP_GATES.get((the_op, len(params)))
+            gate = Barrier(len(slots)) if gate is None else gate(*params)
+            bulk_data.append((gate, [qubits[slot] for slot in slots], []))
 
     def _op_search(self, op, reg_list, param_list=None):  # pylint: disable-msg=invalid-name
         """
-        Find an op in the gate definitions included
+        Find an op in the gate definitions included and unroll it.
+        Returns number of instructions added, 0 if not found.
         """
 
         arity = 0
         if param_list:
             arity = len(param_list)
 
-        gate_definition = self._unrollable(self._op_sig(op, arity))
-
-        if gate_definition:
-            self._unroll(gate_definition, reg_list, param_list)
+        if not self.unroll:
+            body = self._gate_body(self._op_sig(op, arity))
+            if not body or not body.size:  # Nothing to expand, as when unrolling
+                return 0
+            if self.analytics:
+                self.analytics.composite_op()
+            # Operands beyond the definition's regs are ignored, as when unrolling
+            return self._append_gate(QasmGate(body, tuple(param_list or ())),
+                                     reg_list[:body.num_qubits])
+
+        template = self._template(self._op_sig(op, arity))
+
+        if not template:
+            return 0
+        if self.analytics:
+            state = self.analytics.start_gate(self._instruction_count())
+            added = self._unroll(template, reg_list, param_list)
+            self.analytics.end_gate(template, self._instruction_count(), state)
+            return added
+        return self._unroll(template, reg_list, param_list)
 
     def translate(self):
         """
@@ -504,36 +1080,82 @@ class Ast2Circ():
 
         if not self.circuit:
             self._create_quantum_circuit()
+        self._index_registers()
 
-        for entry in self.nuq2_ast['c_sect']:
-            try:
-                op_type = entry['type']
-                if op_type is ASTType.OP:
-                    starting_circuit_size = self.circuit.size()
-                    self._op_append(entry, self.circuit.qregs, self.circuit.cregs,
-                                    self.circuit.qubits, self.circuit.clbits)
-                    if self.circuit.size() == starting_circuit_size:
-                        raise Ast2CircOpNotFoundException(section='c_sect',
-                                                          entry=entry)
-                elif op_type is ASTType.BARRIER:
-                    self._barrier_append(entry, self.circuit.qregs, self.circuit.qubits)
-                elif op_type is ASTType.MEASURE:
-                    self._measure_append(entry, self.circuit.qregs, self.circuit.cregs,
-                                         self.circuit.qubits, self.circuit.clbits)
-            except NameError as ex:
-                raise Ast2CircTranslationException(section='c_sect',
-                                                   entry=entry,
-                                                   prev_ex=ex)
-
-            else:  # It's nothing we care about in this stage
-                pass
+        self._append_entries(self.nuq2_ast['c_sect'])
         return self
 
+    def append_entries(self, code_entries):
+        """
+        Append to self.circuit already translated the operations of
+        code elements added to the end of self.nuq2_ast since, picking
+        up any gate definitions added too.
+
+        Parameters
+        ----------
+        code_entries : list
+            DESCRIPTION. The c_sect elements added. Registers can't be
+            added to the circuit, so these must not declare any.
+
+        Returns
+        -------
+        TYPE, Ast2Circ
+            DESCRIPTION. Ast2Circ self, to access attributes after translation.
+
+        """
+        self._marshall_gatedefs()
+        self._append_entries(code_entries)
+        return self
+
+    def _append_entries(self, code_entries):
+        """Append the operations of code elements to self.circuit"""
+        if self.qregs_by_name is None:
+            self._index_registers()
+        analytics = self.analytics
+        self._start_bulk()
+        try:
+            for entry in code_entries:
+                self._append_entry(entry, analytics)
+        finally:
+            self._end_bulk()
+
+    def _append_entry(self, entry, analytics):
+        """Append the operations of a code element to self.circuit"""
+        try:
+            op_type = entry['type']
+            if op_type is ASTType.OP:
+                if analytics:
+                    analytics.start_op(self._instruction_count())
+                added = self._op_append(entry)
+                if analytics:
+                    param_list = entry.get('param_list')
+                    analytics.end_op(entry,
+                                     self._op_sig(entry['op'],
+                                                  len(param_list) if param_list else 0),
+                                     self._instruction_count())
+                if not added:
+                    raise Ast2CircOpNotFoundException(section='c_sect',
+                                                      entry=entry)
+            elif op_type is ASTType.BARRIER:
+                self._barrier_append(entry)
+            elif op_type is ASTType.MEASURE:
+                self._measure_append(entry)
+        except (NameError, ExpressionException, CircuitError) as ex:
+            raise Ast2CircTranslationException(section='c_sect',
+                                               entry=entry,
+                                               prev_ex=ex)
+
+        else:  # It's nothing we care about in this stage
+            pass
+
     @staticmethod
     def from_file(filepath):
         """
-        Used in early testing to load stringified AST from file.
-        May no longer work correctly at present.
+        Load nuqasm2 AST from file, either a binary AST record written by
+        astfile.dump_ast() (e.g., nuqasm2 -a --ast_format binary), JSON Lines
+        written by astfile.dump_ast_jsonl() (nuqasm2 -a --ast_format jsonl)
+        or a stringified AST as printed by nuqasm2 -a.
+        Types of c_sect entries are loaded as ASTType either way.
 
         Parameters
         ----------
@@ -548,16 +1170,24 @@ class Ast2Circ():
         Returns
         -------
         Ast2Circ
-            instance with loaded stringified nuqasm2 AST.
+            instance with loaded nuqasm2 AST.
 
         """
         if not os.path.exists(filepath) or not os.access(filepath, os.R_OK):
             raise Ast2CircException(filepath=filepath)
+        if is_ast_file(filepath):
+            return Ast2Circ(nuq2_ast=load_ast_file(filepath))
+        if is_ast_jsonl_file(filepath):
+            with open(filepath, 'r') as file_handle:
+                return Ast2Circ(nuq2_ast=load_ast_jsonl(file_handle))
         file_handle = open(filepath, 'r')
         text = file_handle.read()
         file_handle.close()
-        text = re.sub(r'(<ASTType\.\w*\: \d*>)', r"'\g<1>'", text)
-        return Ast2Circ(nuq2_ast=ast.literal_eval(text), loading_from_file=True)
+        text = re.sub(r'<ASTType\.\w*\: (\d*)>', r"\g<1>", text)
+        nuq2_ast = ast.literal_eval(text)
+        for entry in nuq2_ast['c_sect']:
+            entry['type'] = ASTType(entry['type'])
+        return Ast2Circ(nuq2_ast=nuq2_ast)
 
     @staticmethod
     def _from_qasm_str(text):
@@ -572,7 +1202,9 @@ class Ast2Circ():
                       save_pgm_source=False, save_element_source=False,
                       save_gate_source=False,
                       show_gate_decls=False,
-                      include_path='.'):
+                      include_path='.',
+                      compact=False,
+                      cache_dir=None):
         """
         Loads qasm, translates, and returns a QuantumCircuit.
         Analogous to qiskit.circuit.QuantumCircuit.from_qasm_str()
@@ -600,6 +1232,10 @@ class Ast2Circ():
             Show gate decls in of AST c_sect. The default is False.
         include_path : string, optional
             Path to search for included files. The default is '.'.
+        compact : bool, optional
+            Keep AST c_sect as compact Compact_C_Sect. The default is False.
+        cache_dir : string, optional
+            Directory of on-disk AST cache. The default is None.
 
         Returns
         -------
@@ -617,7 +1253,9 @@ class Ast2Circ():
                             save_element_source=save_element_source,
                             save_gate_source=save_gate_source,
                             show_gate_decls=show_gate_decls,
-                            include_path=include_path)
+                            include_path=include_path,
+                            compact=compact,
+                            cache_dir=cache_dir)
         qt.translate()
         ast2circ = Ast2Circ(nuq2_ast=qt.get_translation())
         return ast2circ.translate().circuit
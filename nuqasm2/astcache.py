@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+astcache.py
+Persistent on-disk cache of nuqasm2 translations keyed by source hash
+Copyright 2019 Jack Woehr jwoehr@softwoehr.com PO Box 51, Golden, CO 80402-0051.
+Apache-2.0 license -- See LICENSE which you should have received with this code.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+WITHOUT ANY EXPRESS OR IMPLIED WARRANTIES.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+
+class AstCache():
+    """
+    Directory of pickled translation dicts.
+
+    An entry's name is a hash of the program source, the translator
+    options, and the cache format. Each entry also records the content
+    hash of every file included, transitively, and is only used while
+    they all still hash the same.
+
+    Entries are pickles, so the cache directory must be trusted.
+    """
+
+    FORMAT = 3  # Bump whenever the shape of the translation changes.
+
+    _digest_memo = {}
+    _digest_memo_lock = threading.Lock()
+
+    def __init__(self, cache_dir):
+        """
+        Parameters
+        ----------
+        cache_dir : string
+            Directory holding cache entries, created if absent.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def digest_bytes(data):
+        """Return hex digest of bytes"""
+        return hashlib.sha256(data).hexdigest()
+
+    @classmethod
+    def digest_file(cls, filepath):
+        """
+        Return hex digest of file content or None if it can't be read.
+        Digests are remembered per process for as long as the file's
+        modification time and size are unchanged.
+        """
+        try:
+            stat = os.stat(filepath)
+            memo_key = (filepath, stat.st_mtime_ns, stat.st_size)
+            with cls._digest_memo_lock:
+                digest = cls._digest_memo.get(memo_key)
+            if digest is None:
+                with open(filepath, 'rb') as file_handle:
+                    digest = cls.digest_bytes(file_handle.read())
+                with cls._digest_memo_lock:
+                    cls._digest_memo[memo_key] = digest
+        except OSError:
+            digest = None
+        return digest
+
+    def key(self, source_digest, options):
+        """
+        Return the entry name for a program.
+
+        Parameters
+        ----------
+        source_digest : string
+            Hex digest of the program source.
+        options : tuple
+            Translator options affecting the translation.
+
+        Returns
+        -------
+        string
+            Entry name.
+
+        """
+        text = repr((self.FORMAT, source_digest, options))
+        return self.digest_bytes(text.encode('utf-8'))
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + '.pickle')
+
+    def load(self, key):
+        """
+        Return the cached translation dict for key, or None if there
+        is none or any include file has changed since it was cached.
+        """
+        try:
+            with open(self._entry_path(key), 'rb') as file_handle:
+                entry = pickle.load(file_handle)
+        except Exception:  # pylint: disable-msg=broad-except
+            return None  # Absent, unreadable or from an incompatible version
+        if not isinstance(entry, dict) or entry.get('format') != self.FORMAT:
+            return None
+        for filepath, digest in entry['includes']:
+            if self.digest_file(filepath) != digest:
+                return None
+        return entry['translation']
+
+    def save(self, key, translation):
+        """
+        Store translation under key, recording digests of its include files.
+        Files which can't be read prevent caching.
+        Written to a temporary file first so readers never see a partial entry.
+        """
+        includes = []
+        for filepath in translation['t_sect']['filepaths'][1:]:
+            digest = self.digest_file(filepath)
+            if digest is None:
+                return
+            includes.append((filepath, digest))
+        entry = {'format': self.FORMAT,
+                 'includes': includes,
+                 'translation': translation}
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file_handle:
+                pickle.dump(entry, file_handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._entry_path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
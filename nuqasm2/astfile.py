@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+astfile.py
+File formats for nuqasm2 translations (AST): versioned binary records
+and streamed JSON Lines
+Copyright 2019 Jack Woehr jwoehr@softwoehr.com PO Box 51, Golden, CO 80402-0051.
+Apache-2.0 license -- See LICENSE which you should have received with this code.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+WITHOUT ANY EXPRESS OR IMPLIED WARRANTIES.
+"""
+import io
+import json
+import mmap
+import pickle
+import struct
+from .qasmast import ASTType, Source_Buffer, Source_Span
+
+# A record is MAGIC, the format version as a little-endian unsigned short,
+# then the translation dict pickled at PROTOCOL. Records may be concatenated.
+# Format 2 added retained source as Source_Buffer and Source_Span.
+MAGIC = b'NUQASM2AST'
+FORMAT = 2
+FORMATS_READ = (1, 2)
+PROTOCOL = 4
+_HEADER = struct.Struct('<' + str(len(MAGIC)) + 'sH')
+
+# The only classes a record may contain besides builtin containers and scalars
+_ALLOWED_CLASSES = {('nuqasm2.qasmast', 'ASTType'),
+                    ('nuqasm2.qasmast', 'Compact_C_Sect'),
+                    ('nuqasm2.qasmast', 'Source_Buffer'),
+                    ('nuqasm2.qasmast', 'Source_Span'),
+                    ('array', 'array'),
+                    ('array', '_array_reconstructor'),
+                    ('copyreg', '_reconstructor'),
+                    ('copyreg', '__newobj__'),
+                    ('builtins', 'object')}
+
+
+class AstFileException(Exception):
+    """Not a nuqasm2 AST record, or one of an unknown format version"""
+
+    def __init__(self, message, version=None):
+        super(AstFileException, self).__init__(message)
+        self.message = message
+        self.version = version
+        self.errcode = 300
+
+    def errpacket(self):
+        "Get the error packet from exception as dict"
+        return {'message': self.message,
+                'version': self.version,
+                'errcode': self.errcode}
+
+
+class _Unpickler(pickle.Unpickler):
+    """Unpickler which only loads the classes a translation is made of"""
+
+    def find_class(self, module, name):
+        if (module, name) not in _ALLOWED_CLASSES:
+            raise AstFileException("Class not allowed in AST record: " + module + '.' + name)
+        return super(_Unpickler, self).find_class(module, name)
+
+
+def dump_ast(translation, file_handle):
+    """
+    Write a translation as a binary AST record.
+
+    Parameters
+    ----------
+    translation : dict
+        Translation from QasmTranslator.get_translation(), with
+        c_sect a list or a Compact_C_Sect.
+    file_handle : binary file
+        Open file written to.
+
+    Returns
+    -------
+    None.
+
+    """
+    file_handle.write(_HEADER.pack(MAGIC, FORMAT))
+    pickle.dump(translation, file_handle, protocol=PROTOCOL)
+
+
+def dumps_ast(translation):
+    """Return a translation as a binary AST record in bytes"""
+    out = io.BytesIO()
+    dump_ast(translation, out)
+    return out.getvalue()
+
+
+def load_ast(file_handle):
+    """
+    Read one binary AST record.
+    Types of c_sect entries load as ASTType.
+
+    Parameters
+    ----------
+    file_handle : binary file or mmap
+        Open file positioned at the record, left positioned after it.
+
+    Raises
+    ------
+    AstFileException
+        If not at an AST record of this format version.
+
+    Returns
+    -------
+    dict
+        The translation.
+
+    """
+    header = file_handle.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise AstFileException("Not a nuqasm2 AST record")
+    magic, version = _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise AstFileException("Not a nuqasm2 AST record")
+    if version not in FORMATS_READ:
+        raise AstFileException("Unknown nuqasm2 AST record format", version)
+    return _Unpickler(file_handle).load()
+
+
+def loads_ast(data):
+    """Return the translation in a binary AST record in bytes"""
+    return load_ast(io.BytesIO(data))
+
+
+def load_ast_file(filepath):
+    """
+    Read the first binary AST record of a file, which is memory-mapped
+    rather than read in so only the record itself is copied into memory.
+
+    Parameters
+    ----------
+    filepath : string
+        Path of the file.
+
+    Returns
+    -------
+    dict
+        The translation.
+
+    """
+    with open(filepath, 'rb') as file_handle:
+        with mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return load_ast(mapped)
+
+
+def is_ast_file(filepath):
+    """Return True if filepath starts with a binary AST record"""
+    with open(filepath, 'rb') as file_handle:
+        return file_handle.read(len(MAGIC)) == MAGIC
+
+
+# JSON Lines: each line is an object whose 'section' key says what it is:
+# 't_sect' (translation unit name, datetime_start, later datetime_finish),
+# 'filepath' (filenum, filepath), 'c_sect' and 'g_sect' (an element
+# or gate definition with ASTType written as its name), 's_sect' (a source body).
+_JSON_SEPARATORS = (',', ':')
+
+
+def _json_source(obj):
+    """Encode retained source as JSON text"""
+    if isinstance(obj, Source_Buffer):
+        return list(obj)
+    if isinstance(obj, Source_Span):
+        return str(obj)
+    raise TypeError('Object of type ' + type(obj).__name__ + ' is not JSON serializable')
+
+
+def iter_ast_jsonl(qt, retain=False):  # pylint: disable-msg=invalid-name
+    """
+    Generator translating with QasmTranslator.iter_translate(), yielding
+    the translation as JSON Lines, each element as soon as it is parsed.
+
+    Parameters
+    ----------
+    qt : QasmTranslator
+        Translator not yet run.
+    retain : bool, optional
+        Keep code elements in the translator's c_sect too, e.g., to
+        generate a circuit after. The default is False.
+
+    Yields
+    ------
+    string
+        Line of JSON, without line end.
+
+    """
+    dumps = json.JSONEncoder(separators=_JSON_SEPARATORS, default=_json_source).encode
+    t_sect = qt.get_t_sect()
+    filepaths = qt.get_filepaths()
+    filepaths_done = 0
+
+    def header_records():
+        """Return records of t_sect and filepaths not yet written"""
+        nonlocal filepaths_done
+        records = []
+        if filepaths_done == 0:
+            records.append(dumps({'section': 't_sect', 'name': t_sect['name'],
+                                  'datetime_start': t_sect['datetime_start']}))
+        for filenum in range(filepaths_done, len(filepaths)):
+            records.append(dumps({'section': 'filepath', 'filenum': filenum,
+                                  'filepath': filepaths[filenum]}))
+        filepaths_done = len(filepaths)
+        return records
+
+    for section, entry in qt.iter_translate(retain=retain):
+        if filepaths_done < len(filepaths):
+            yield from header_records()
+        record = {'section': section}
+        record.update(entry)
+        if section == 'c_sect':
+            record['type'] = entry['type'].name
+        yield dumps(record)
+    yield from header_records()
+    for body in qt.get_s_sect():
+        record = {'section': 's_sect'}
+        record.update(body)
+        yield dumps(record)
+    yield dumps({'section': 't_sect', 'datetime_finish': t_sect['datetime_finish']})
+
+
+def dump_ast_jsonl(qt, file_handle, retain=False):  # pylint: disable-msg=invalid-name
+    """
+    Translate with iter_ast_jsonl() writing each line to file_handle
+    as it is produced. See iter_ast_jsonl().
+    """
+    for line in iter_ast_jsonl(qt, retain=retain):
+        file_handle.write(line)
+        file_handle.write('\n')
+
+
+def load_ast_jsonl(file_handle):
+    """
+    Read a translation written as JSON Lines.
+    Types of c_sect entries load as ASTType.
+
+    Parameters
+    ----------
+    file_handle : text file
+        Open file read to its end.
+
+    Returns
+    -------
+    dict
+        The translation.
+
+    """
+    translation = {'t_sect': {'name': None, 'filepaths': [],
+                              'datetime_start': None, 'datetime_finish': None},
+                   'c_sect': [], 'g_sect': [], 's_sect': []}
+    t_sect = translation['t_sect']
+    for line in file_handle:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        section = record.pop('section')
+        if section == 't_sect':
+            t_sect.update(record)
+        elif section == 'filepath':
+            t_sect['filepaths'].append(record['filepath'])
+        else:
+            if section == 'c_sect':
+                record['type'] = ASTType[record['type']]
+            translation[section].append(record)
+    return translation
+
+
+def is_ast_jsonl_file(filepath):
+    """Return True if filepath starts with a JSON Lines translation"""
+    with open(filepath, 'r') as file_handle:
+        return file_handle.readline().startswith('{"section":')
+
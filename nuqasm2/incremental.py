@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+incremental.py
+Incremental retranslation of a program edited repeatedly, e.g., in an editor
+Copyright 2019 Jack Woehr jwoehr@softwoehr.com PO Box 51, Golden, CO 80402-0051.
+Apache-2.0 license -- See LICENSE which you should have received with this code.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+WITHOUT ANY EXPRESS OR IMPLIED WARRANTIES.
+"""
+import bisect
+import datetime
+from .qasmast import QasmTranslator, Statement_Lexer, ASTType
+from .ast2circ import Ast2Circ
+
+
+class IncrementalTranslator():
+    """
+    Translation session for a program which is edited and translated
+    again and again, e.g., on each save in an editor.
+
+    The header of the program (everything up to the first op, measure,
+    barrier or if, including all include files) is translated by
+    QasmTranslator. For the body the session keeps the source lines and
+    the span of each statement with the code elements and gate
+    definitions it was translated to. After an edit of the body only
+    the statements from the first line changed up to where the old
+    source resumes unchanged are parsed again. Statements after that
+    are reused, moved to their new line numbers. An edit of the header
+    translates the header again, the body being reused if it is unchanged.
+
+    The circuit generated by get_circuit() is regenerated after an edit,
+    except that when the edit only appended statements to the body,
+    declaring no registers, their operations are appended to the circuit.
+
+    A program with an include in its body is translated entire on each update.
+    """
+
+    def __init__(self, name='main', filepath=None,
+                 no_unknown=False,
+                 save_element_source=False,
+                 save_gate_source=False,
+                 show_gate_decls=False,
+                 include_path='.',
+                 include_cache=True):
+        """
+        Parameters
+        ----------
+        name : string, optional
+            User-defined name for translation unit. The default is 'main'.
+        filepath : string, optional
+            Source code filepath (informational only). The default is None.
+        no_unknown, save_element_source, save_gate_source, show_gate_decls,
+        include_path, include_cache : optional
+            As for QasmTranslator.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.name = name
+        self.filepath = filepath
+        self.include_cache = include_cache
+        self.options = {'no_unknown': no_unknown,
+                        'save_element_source': save_element_source,
+                        'save_gate_source': save_gate_source,
+                        'show_gate_decls': show_gate_decls,
+                        'include_path': include_path}
+        self.lines = None
+        self.translation = None
+        # The header as translated by QasmTranslator
+        self.header = None
+        # First line of the body, None if there is none or no incremental body
+        self.body_linenum = None
+        # (start linenum, end linenum) of each body statement and the
+        # number of code elements and gate definitions it translated to
+        self.spans = []
+        self.c_counts = []
+        self.g_counts = []
+        self.body_c = []
+        self.body_g = []
+        # Last body statement was unfinished at end of source
+        self.unfinished = False
+        # How the last update was done: 'full', 'header', 'body' or 'none'
+        self.last_update = None
+        # Statements parsed in the body by the last update
+        self.parsed = 0
+        self.ast2circ = None
+        self.circuit_entries = 0
+        self.circuit_appendable = False
+
+    def update(self, qasmsourcelines):
+        """
+        Translate the current version of the program.
+        Code elements reused from the previous translation are updated
+        in place, so only the translation returned is current.
+
+        Parameters
+        ----------
+        qasmsourcelines : list or string
+            The whole source, a list of lines or a string.
+
+        Raises
+        ------
+        Qasm_Exception
+            If the source is in error, leaving the session as it was.
+
+        Returns
+        -------
+        dict
+            The translation, as QasmTranslator.get_translation().
+
+        """
+        if isinstance(qasmsourcelines, str):
+            qasmsourcelines = qasmsourcelines.split('\n')
+        lines = list(qasmsourcelines)
+        datetime_start = datetime.datetime.now().isoformat()
+        old = self.lines
+        if old is None or self.spans is None:
+            self._update_full(lines)
+        else:
+            prefix = _common_prefix(old, lines)
+            if prefix == len(old) == len(lines):
+                self.last_update = 'none'
+                self.parsed = 0
+                return self.translation
+            suffix = _common_suffix(old, lines, min(len(old), len(lines)) - prefix)
+            if self.body_linenum is None or prefix < self.body_linenum:
+                self._update_header(lines, suffix)
+            else:
+                self._update_body(lines, prefix, suffix)
+        self.lines = lines
+        t_sect = self.header['t_sect']
+        t_sect['datetime_start'] = datetime_start
+        t_sect['datetime_finish'] = datetime.datetime.now().isoformat()
+        self.translation = {'t_sect': t_sect,
+                            'c_sect': self.header['c_sect'] + self.body_c,
+                            'g_sect': self.header['g_sect'] + self.body_g,
+                            's_sect': []}
+        return self.translation
+
+    def get_translation(self):
+        """Return translation made by the last update()"""
+        return self.translation
+
+    def get_circuit(self):
+        """
+        Return QuantumCircuit of the translation made by the last update().
+        The circuit returned before is appended to and returned again if
+        the updates since have only appended operations, else a new
+        circuit is generated.
+        """
+        c_sect = self.translation['c_sect']
+        ast2circ = self.ast2circ
+        self.ast2circ = None  # Don't patch a circuit left half done by an error
+        if ast2circ is not None and self.circuit_appendable:
+            ast2circ.nuq2_ast = self.translation
+            ast2circ.append_entries(c_sect[self.circuit_entries:])
+        else:
+            ast2circ = Ast2Circ(nuq2_ast=self.translation).translate()
+        self.ast2circ = ast2circ
+        self.circuit_entries = len(c_sect)
+        self.circuit_appendable = True
+        return ast2circ.circuit
+
+    def _translator(self, lines):
+        """Return QasmTranslator of lines with this session's options"""
+        return QasmTranslator(lines, name=self.name, filepath=self.filepath,
+                              include_cache=self.include_cache, **self.options)
+
+    def _translate_header(self, lines):
+        """
+        Translate the header of lines
+        Returns the translation and the first line of the body or None
+        """
+        qt = self._translator(line.strip() for line in lines)  # pylint: disable-msg=invalid-name
+        qt.stop_at_body = True
+        for _ in qt.iter_translate():
+            pass
+        return qt.get_translation(), qt.body_linenum
+
+    def _update_full(self, lines, header=None, body_linenum=None):
+        """Translate all of lines, header (unless already translated) then body"""
+        if header is None:
+            header, body_linenum = self._translate_header(lines)
+        self.parsed = 0
+        body = ([], [], [], [], [], False)
+        if body_linenum is not None:
+            body = self._translate_body(lines, body_linenum)
+            if body is None:
+                self._update_whole(lines)
+                return
+            body = body[:-1]
+        self.header = header
+        self.body_linenum = body_linenum
+        self._set_body(*body)
+        self.last_update = 'full'
+        self.circuit_appendable = False
+
+    def _update_whole(self, lines):
+        """Translate lines which have an include in the body, not incrementally"""
+        qt = self._translator([line.strip() for line in lines])  # pylint: disable-msg=invalid-name
+        qt.translate()
+        self.header = qt.get_translation()
+        self.body_linenum = None
+        self._set_body([], [], [], [], [], False)
+        self.spans = None
+        self.last_update = 'full'
+        self.parsed = 0
+        self.circuit_appendable = False
+
+    def _update_header(self, lines, suffix):
+        """Translate the edited header of lines, reusing the body if unchanged"""
+        header, body_linenum = self._translate_header(lines)
+        delta = len(lines) - len(self.lines)
+        if body_linenum is not None and self.body_linenum is not None \
+                and body_linenum - delta == self.body_linenum \
+                and len(lines) - suffix <= body_linenum:
+            self._shift(0, 0, 0, delta)
+            self.header = header
+            self.body_linenum = body_linenum
+            self.parsed = 0
+            self.last_update = 'header'
+            self.circuit_appendable = False
+        else:
+            self._update_full(lines, header, body_linenum)
+
+    def _update_body(self, lines, prefix, suffix):
+        """
+        Translate statements of the body from the first one touching the
+        line prefix, the first line changed, up to the first old statement
+        in the unchanged suffix lines at which lexing is found to resume
+        as before, reusing the rest.
+        """
+        spans = self.spans
+        old_len = len(self.lines)
+        delta = len(lines) - old_len
+        first = bisect.bisect_left(spans, (prefix,))
+        while first and spans[first - 1][1] >= prefix:
+            first -= 1
+        if self.unfinished and first == len(spans):
+            first -= 1
+        while 0 < first < len(spans) and spans[first][0] == spans[first - 1][1]:
+            first -= 1  # Lex from the start of a line
+        start_linenum = spans[first - 1][1] + 1 if first else self.body_linenum
+        resume = max(first, bisect.bisect_left(spans, (old_len - suffix,)))
+        body = self._translate_body(lines, start_linenum, resume, delta)
+        if body is None:
+            self._update_whole(lines)
+            return
+        new_spans, c_sect, g_sect, c_counts, g_counts, unfinished, resume = body
+        appended = first == resume == len(spans) and not self.unfinished
+        c_start = _count_before(self.c_counts, len(self.body_c), first)
+        g_start = _count_before(self.g_counts, len(self.body_g), first)
+        c_resume = c_start + sum(self.c_counts[first:resume])
+        g_resume = g_start + sum(self.g_counts[first:resume])
+        self._shift(resume, c_resume, g_resume, delta)
+        if resume < len(spans):
+            unfinished = self.unfinished
+        spans[first:resume] = new_spans
+        self.body_c[c_start:c_resume] = c_sect
+        self.body_g[g_start:g_resume] = g_sect
+        self.c_counts[first:resume] = c_counts
+        self.g_counts[first:resume] = g_counts
+        self.unfinished = unfinished
+        self.last_update = 'body'
+        if not appended or any(entry['type'] in (ASTType.QREG, ASTType.CREG)
+                               for entry in c_sect):
+            self.circuit_appendable = False
+
+    def _translate_body(self, lines, start_linenum, resume=None, delta=0):
+        """
+        Lex and translate lines from start_linenum, where a statement
+        starts a line, to the end, or, if resume is an index in self.spans,
+        until reaching the line on which that or a later old statement
+        starts a line in the unchanged end of the source, delta lines on.
+        Returns (spans, c_sect, g_sect, c_counts, g_counts, unfinished,
+        index in self.spans of the first old statement to reuse),
+        or None if there is an include.
+        """
+        qt = QasmTranslator([], filepath=self.filepath, include_cache=False,  # pylint: disable-msg=invalid-name
+                            **self.options)
+        c_sect = qt.get_c_sect()
+        g_sect = qt.get_g_sect()
+        spans = []
+        c_counts = []
+        g_counts = []
+        old_spans = self.spans if resume is not None else []
+        if resume is None:
+            resume = 0
+        lexer = Statement_Lexer()
+        for linenum in range(start_linenum, len(lines)):
+            if not lexer.fragments:
+                old_linenum = linenum - delta
+                while resume < len(old_spans) and old_spans[resume][0] < old_linenum:
+                    resume += 1
+                if resume < len(old_spans) and old_spans[resume][0] == old_linenum \
+                        and (resume == 0 or old_spans[resume - 1][1] < old_linenum):
+                    break
+            line = lines[linenum].strip()
+            if line:
+                statements = lexer.lex(linenum, line)
+                if not self._translate_statements(qt, statements, spans, c_counts, g_counts):
+                    return None
+        else:
+            resume = len(old_spans)
+        statement = lexer.flush()
+        unfinished = statement is not None
+        if unfinished and not self._translate_statements(qt, [statement],
+                                                         spans, c_counts, g_counts):
+            return None
+        self.parsed = len(spans)
+        return spans, list(c_sect), list(g_sect), c_counts, g_counts, unfinished, resume
+
+    @staticmethod
+    def _translate_statements(qt, statements, spans, c_counts, g_counts):  # pylint: disable-msg=invalid-name
+        """
+        Translate statements with qt, recording span and counts of each
+        Returns False at an include.
+        """
+        c_sect = qt.get_c_sect()
+        g_sect = qt.get_g_sect()
+        for start_linenum, end_linenum, source in statements:
+            c_len = len(c_sect)
+            g_len = len(g_sect)
+            if qt.translate_statement(0, start_linenum, end_linenum,
+                                      source) == ASTType.INCLUDE:
+                return False
+            spans.append((start_linenum, end_linenum))
+            c_counts.append(len(c_sect) - c_len)
+            g_counts.append(len(g_sect) - g_len)
+        return True
+
+    def _shift(self, index, c_index, g_index, delta):
+        """
+        Move body statements from index on, translated to code elements
+        from c_index and gate definitions from g_index, by delta lines
+        """
+        if not delta:
+            return
+        self.spans[index:] = [(start + delta, end + delta)
+                              for start, end in self.spans[index:]]
+        for entry in self.body_c[c_index:]:
+            entry['linenum'] += delta
+        for gate in self.body_g[g_index:]:
+            gate['linenum'] += delta
+
+    def _set_body(self, spans, c_sect, g_sect, c_counts, g_counts, unfinished):  # pylint: disable-msg=too-many-arguments
+        """Replace the translated body"""
+        self.spans = spans
+        self.body_c = c_sect
+        self.body_g = g_sect
+        self.c_counts = c_counts
+        self.g_counts = g_counts
+        self.unfinished = unfinished
+
+
+def _count_before(counts, total, index):
+    """Return sum of counts before index, total being the sum of all"""
+    if index > len(counts) // 2:
+        return total - sum(counts[index:])
+    return sum(counts[:index])
+
+
+# Lines compared at a time in finding where old and new source differ
+_COMPARE_BLOCK = 1024
+
+
+def _common_prefix(old, new):
+    """Return number of leading lines old and new have in common"""
+    most = min(len(old), len(new))
+    prefix = 0
+    while prefix + _COMPARE_BLOCK <= most and \
+            old[prefix:prefix + _COMPARE_BLOCK] == new[prefix:prefix + _COMPARE_BLOCK]:
+        prefix += _COMPARE_BLOCK
+    while prefix < most and old[prefix] == new[prefix]:
+        prefix += 1
+    return prefix
+
+
+def _common_suffix(old, new, most):
+    """Return number of trailing lines, at most most, old and new have in common"""
+    old_len = len(old)
+    new_len = len(new)
+    suffix = 0
+    while suffix + _COMPARE_BLOCK <= most and \
+            old[old_len - suffix - _COMPARE_BLOCK:old_len - suffix] == \
+            new[new_len - suffix - _COMPARE_BLOCK:new_len - suffix]:
+        suffix += _COMPARE_BLOCK
+    while suffix < most and old[old_len - 1 - suffix] == new[new_len - 1 - suffix]:
+        suffix += 1
+    return suffix
@@ -5,11 +5,20 @@ Created on Thu Feb 27 13:41:36 2020
 Implement load interface proposed for Qiskit OpenQASM loading
 @author: jax
 """
-from typing import List
+import atexit
+import multiprocessing.pool
+import threading
+from typing import Iterator, List, Tuple, Union
 from qiskit import QuantumCircuit
 from nuqasm2 import Ast2Circ, Ast2CircException
+from nuqasm2.qasmast import Qasm_Exception, Qasm_Cannot_Read_File_Exception
 
-def load_from_string(qasm_string: str or List[str], include_path: str = None) -> QuantumCircuit:
+_POOL = None
+_POOL_WORKERS = None
+_POOL_LOCK = threading.Lock()
+
+def load_from_string(qasm_string: str or List[str], include_path: str = None,
+                     cache_dir: str = None) -> QuantumCircuit:
     """
 
     Parameters
@@ -18,6 +27,8 @@ def load_from_string(qasm_string: str or List[str], include_path: str = None) ->
         OPENQASM 2.x source to be assembled to qiskit.QuantumCircuit
     include_path : string, optional
         Include path list, e.g., for finding qelib1.inc. The default is None.
+    cache_dir : string, optional
+        Directory of on-disk AST cache to reuse translations. The default is None.
 
     Returns
     -------
@@ -27,10 +38,13 @@ def load_from_string(qasm_string: str or List[str], include_path: str = None) ->
     """
     circ = Ast2Circ.from_qasm_str(qasm_string,
                                   include_path=include_path,
-                                  no_unknown=True)
+                                  no_unknown=True,
+                                  compact=True,
+                                  cache_dir=cache_dir)
     return circ
 
-def load_from_file(path: str, include_path: str = None) -> QuantumCircuit:
+def load_from_file(path: str, include_path: str = None,
+                   cache_dir: str = None) -> QuantumCircuit:
     """
 
     Parameters
@@ -39,6 +53,8 @@ def load_from_file(path: str, include_path: str = None) -> QuantumCircuit:
         path to OPENQASM 2.x source to be assembled to qiskit.QuantumCircuit
     include_path : string, optional
         Include path list, e.g., for finding qelib1.inc. The default is None.
+    cache_dir : string, optional
+        Directory of on-disk AST cache to reuse translations. The default is None.
 
     Returns
     -------
@@ -51,12 +67,15 @@ def load_from_file(path: str, include_path: str = None) -> QuantumCircuit:
     _file.close()
     circ = Ast2Circ.from_qasm_str(qasm_string,
                                   include_path=include_path,
-                                  no_unknown=True)
+                                  no_unknown=True,
+                                  compact=True,
+                                  cache_dir=cache_dir)
     return circ
 
 def load(filename: str = None,
          data: str or List[str] = None,
-         include_path: str = None) -> QuantumCircuit:
+         include_path: str = None,
+         cache_dir: str = None) -> QuantumCircuit:
     """
 
 
@@ -68,6 +87,8 @@ def load(filename: str = None,
         Qasm program source as string or list of string. The default is None.
     include_path : str, optional
         Include path for qasm include directives.. The default is None.
+    cache_dir : str, optional
+        Directory of on-disk AST cache to reuse translations. The default is None.
 
     Raises
     ------
@@ -85,7 +106,137 @@ def load(filename: str = None,
         raise Ast2CircException("To load, either filename or data (and not both) must be provided.")
     circ = None
     if data:
-        circ = load_from_string(data, include_path=include_path)
+        circ = load_from_string(data, include_path=include_path, cache_dir=cache_dir)
     elif filename:
-        circ = load_from_file(filename, include_path=include_path)
+        circ = load_from_file(filename, include_path=include_path, cache_dir=cache_dir)
     return circ
+
+def _load_one(item: Tuple) -> QuantumCircuit or dict:
+    """
+    Load one program of a batch, in this process or a worker process.
+
+    Parameters
+    ----------
+    item : Tuple
+        (filename, data, include_path, cache_dir) with one of filename
+        and data None.
+
+    Returns
+    -------
+    QuantumCircuit or dict
+        The circuit, or the errpacket() of the exception loading it.
+
+    """
+    filename, data, include_path, cache_dir = item
+    try:
+        if filename is not None:
+            return load_from_file(filename, include_path=include_path, cache_dir=cache_dir)
+        return load_from_string(data, include_path=include_path, cache_dir=cache_dir)
+    except (Qasm_Exception, Ast2CircException) as ex:
+        return ex.errpacket()
+    except OSError:
+        return Qasm_Cannot_Read_File_Exception(None, None, None, None, filename).errpacket()
+
+def _indexed_load_one(indexed_item: Tuple) -> Tuple:
+    """Return (index, _load_one(item)) for (index, item)"""
+    index, item = indexed_item
+    return index, _load_one(item)
+
+def _get_pool(workers: int) -> multiprocessing.pool.Pool:
+    """
+    Return the persistent pool of load_many(), (re)creating it if it
+    does not have the number of workers wanted. Workers outlive the batch
+    so their include caches stay warm for the next.
+    """
+    global _POOL, _POOL_WORKERS  # pylint: disable-msg=global-statement
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS != workers:
+            if _POOL is not None:
+                _POOL.close()
+            _POOL = multiprocessing.Pool(workers)
+            _POOL_WORKERS = workers
+        return _POOL
+
+def close_pool() -> None:
+    """
+    Shut down the worker pool of load_many(), if any.
+    Called at exit, or call to free the workers sooner.
+
+    Returns
+    -------
+    None
+
+    """
+    global _POOL, _POOL_WORKERS  # pylint: disable-msg=global-statement
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.close()
+            _POOL.join()
+        _POOL = None
+        _POOL_WORKERS = None
+
+atexit.register(close_pool)
+
+def load_many(filenames: List[str] = None,
+              data: List[str or List[str]] = None,
+              include_path: str = None,
+              cache_dir: str = None,
+              workers: int = None,
+              chunksize: int = 1,
+              ordered: bool = True) -> Union[List, Iterator[Tuple]]:
+    """
+    Load a batch of programs in parallel on a persistent pool of worker
+    processes.
+
+    Parameters
+    ----------
+    filenames : List[str], optional
+        Filepaths to qasm program sources. The default is None.
+    data : List[str or List[str]], optional
+        Qasm program sources, each as string or list of string.
+        The default is None.
+    include_path : str, optional
+        Include path for qasm include directives. The default is None.
+    cache_dir : str, optional
+        Directory of on-disk AST cache to reuse translations. The default is None.
+    workers : int, optional
+        Number of worker processes. The default is None, meaning one per cpu.
+        0 or 1 loads the batch in this process.
+    chunksize : int, optional
+        Number of programs handed to a worker at a time. The default is 1.
+    ordered : bool, optional
+        If True return the list of results in input order, else return
+        a generator yielding (index, result) as each program is loaded.
+        The default is True.
+
+    Raises
+    ------
+    Ast2CircException
+        If both or neither filenames and data are present.
+
+    Returns
+    -------
+    List or Iterator[Tuple]
+        Results, each a QuantumCircuit or, if the program failed to load,
+        the errpacket() dict of the exception, which has an 'errcode' key.
+
+    """
+
+    if (data is None and filenames is None) or (data is not None and filenames is not None):
+        raise Ast2CircException("To load, either filenames or data (and not both) must be provided.")
+    if filenames is not None:
+        items = [(filename, None, include_path, cache_dir) for filename in filenames]
+    else:
+        items = [(None, source, include_path, cache_dir) for source in data]
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    if workers <= 1 or len(items) <= 1:
+        if ordered:
+            return [_load_one(item) for item in items]
+        return map(_indexed_load_one, enumerate(items))
+
+    pool = _get_pool(workers)
+    if ordered:
+        return pool.map(_load_one, items, chunksize)
+    return pool.imap_unordered(_indexed_load_one, enumerate(items), chunksize)
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+memprofile.py
+Memory profiling of nuqasm2 translations and circuit generation
+Copyright 2019 Jack Woehr jwoehr@softwoehr.com PO Box 51, Golden, CO 80402-0051.
+Apache-2.0 license -- See LICENSE which you should have received with this code.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+WITHOUT ANY EXPRESS OR IMPLIED WARRANTIES.
+"""
+from array import array
+from collections import Counter
+from enum import Enum
+import sys
+import tracemalloc
+from .qasmast import ASTType, Compact_C_Sect
+
+SECTIONS = ('t_sect', 'c_sect', 'g_sect', 's_sect')
+
+# Objects sized without looking inside them
+_ATOMIC = (str, bytes, bytearray, int, float, bool, type(None), array)
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    Return bytes of obj and everything it holds, counting each object once.
+
+    Parameters
+    ----------
+    obj : object
+        Object to size.
+    seen : set, optional
+        Ids of objects already counted, updated with those counted now,
+        so objects shared with others sized before aren't counted again.
+        The default is None.
+
+    Returns
+    -------
+    int
+        Bytes.
+
+    """
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (Enum, type)):
+            continue  # ASTType members and classes belong to no translation
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, _ATOMIC):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            if hasattr(obj, '__dict__'):
+                stack.append(obj.__dict__)
+            for slot in getattr(type(obj), '__slots__', ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+    return size
+
+
+def _compact_element_memory(c_sect, seen):
+    """Return Counter of bytes of a Compact_C_Sect's rows by ASTType name"""
+    elements = Counter()
+    row_bytes = (c_sect.types.itemsize + c_sect.locations.itemsize + c_sect.ops.itemsize +
+                 c_sect.param_offsets.itemsize + c_sect.reg_offsets.itemsize)
+    params = c_sect.param_offsets
+    regs = c_sect.reg_offsets
+    for index, type_value in enumerate(c_sect.types):
+        name = ASTType(type_value).name
+        elements[name] += (row_bytes +
+                           (params[index + 1] - params[index]) * c_sect.params.itemsize +
+                           (regs[index + 1] - regs[index]) * c_sect.regs.itemsize)
+        other = c_sect.others.get(index)
+        if other:
+            elements[name] += deep_sizeof(other, seen)
+    elements['(symbols)'] = deep_sizeof(c_sect.symbols, seen) + \
+        deep_sizeof(c_sect.symbol_ids, seen)
+    return elements
+
+
+def translation_memory(translation):
+    """
+    Return bytes held by a translation, by section and by element type.
+    Objects shared between sections are counted in the first section
+    holding them in the order s_sect, t_sect, g_sect, c_sect, so retained
+    source is counted in s_sect, or if only elements and gates keep source,
+    with the first to refer to it.
+
+    Parameters
+    ----------
+    translation : dict
+        Translation from QasmTranslator.get_translation().
+
+    Returns
+    -------
+    dict
+        'total' bytes, 'sections' bytes by section name, and 'elements'
+        bytes of c_sect elements by ASTType name. A Compact_C_Sect's
+        element bytes are its array rows and the dicts of elements other
+        than ops, measures and barriers, its symbol table being counted
+        as '(symbols)'.
+
+    """
+    seen = {id(translation)}
+    sections = {}
+    for section in ('s_sect', 't_sect', 'g_sect'):
+        sections[section] = deep_sizeof(translation.get(section), seen)
+    c_sect = translation.get('c_sect')
+    if isinstance(c_sect, Compact_C_Sect):
+        elements = _compact_element_memory(c_sect, set(seen))
+        sections['c_sect'] = deep_sizeof(c_sect, seen)
+    else:
+        elements = Counter()
+        for entry in c_sect:
+            elements[entry['type'].name] += deep_sizeof(entry, seen)
+        sections['c_sect'] = sum(elements.values()) + deep_sizeof(c_sect, seen)
+    sections = {section: sections[section] for section in SECTIONS}
+    return {'total': sum(sections.values()) + deep_sizeof(translation, seen - {id(translation)}),
+            'sections': sections,
+            'elements': dict(elements)}
+
+
+class MemProfile():
+    """
+    Context measuring with tracemalloc the memory allocated while it is
+    entered. Tracing is started on entry and stopped on exit if it wasn't
+    already on. Peak is only exact if tracing wasn't already on or
+    tracemalloc can reset its peak (Python 3.9 on).
+    """
+
+    def __init__(self):
+        """
+        Attributes
+        ----------
+        retained : int
+            Bytes allocated in the context and still held on exit.
+        peak : int
+            Greatest bytes allocated in the context at any one time.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.retained = None
+        self.peak = None
+        self.started = False
+        self.baseline = 0
+
+    def __enter__(self):
+        self.started = not tracemalloc.is_tracing()
+        if self.started:
+            tracemalloc.start()
+        elif hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()  # pylint: disable-msg=no-member
+        self.baseline = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        current, peak = tracemalloc.get_traced_memory()
+        self.retained = current - self.baseline
+        self.peak = max(peak - self.baseline, self.retained)
+        if self.started:
+            tracemalloc.stop()
+        return False
+
+
+def profile_translate(qt):  # pylint: disable-msg=invalid-name
+    """
+    Run QasmTranslator.translate() measuring its memory.
+
+    Parameters
+    ----------
+    qt : QasmTranslator
+        Translator not yet run.
+
+    Returns
+    -------
+    dict
+        'retained' and 'peak' bytes allocated by translation, as
+        measured by tracemalloc, with 'total', 'sections' and 'elements'
+        from translation_memory().
+
+    """
+    with MemProfile() as mem:
+        qt.translate()
+    report = {'retained': mem.retained, 'peak': mem.peak}
+    report.update(translation_memory(qt.get_translation()))
+    return report
+
+
+def profile_circuit(ast2circ):
+    """
+    Run Ast2Circ.translate() measuring the memory the circuit adds.
+
+    Parameters
+    ----------
+    ast2circ : Ast2Circ
+        Circuit generator not yet run.
+
+    Returns
+    -------
+    dict
+        'retained' and 'peak' bytes allocated by circuit generation, as
+        measured by tracemalloc, and 'instructions' in the circuit.
+
+    """
+    with MemProfile() as mem:
+        ast2circ.translate()
+    return {'retained': mem.retained, 'peak': mem.peak,
+            'instructions': len(ast2circ.circuit)}
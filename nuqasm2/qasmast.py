@@ -9,11 +9,21 @@ Apache-2.0 license -- See LICENSE which you should have received with this code.
 THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
 WITHOUT ANY EXPRESS OR IMPLIED WARRANTIES.
 """
+from array import array
+from collections import Counter, OrderedDict, deque
+import copyreg
 from enum import Enum
 import re
 import datetime
+import io
+import itertools
+import mmap
+import multiprocessing
 import os
+import threading
+import time
 from functools import wraps
+from .astcache import AstCache
 
 
 class QTRegEx():
@@ -51,6 +61,19 @@ class QTRegEx():
     GATE_OP_PARAMS = re.compile(r"\S+\((.*)\).*")
     GATE_OP_REGS = re.compile(r".*\s+(\S+);")
 
+    # Leading keyword of a line and the classifiers it dispatches to.
+    # Each classifier's groups are handed to the element constructor.
+    KEYWORD = re.compile(r"^\s*(//|\w+)")
+    INCLUDE_MATCH = re.compile(r"^\s*include\s+\"(\S+)\"\s*;")
+    CTL_2_MATCH = re.compile(r"^\s*(if)\((\w+)(\W+)(\w+)\)\s+(\w+)\s+(\w+\[\w+\]);")
+    QREG_MATCH = re.compile(r"^\s*qreg\s+(\S*)\[(\d+)\]\s*;")
+    CREG_MATCH = re.compile(r"^\s*creg\s+(\S*)\[(\d+)\]\s*;")
+    BARRIER_MATCH = re.compile(r"^\s*barrier\s+([^;]*);")
+    OP_MATCH = re.compile(r"^\s*(\S+)\s+(\S+)\s*;")
+
+    # Punctuation ending statements (or opening a gate body) for the lexer
+    STATEMENT_PUNCT = re.compile(r"[;{}]")
+
 
 class ASTType(Enum):
     """Enums designating element types."""
@@ -74,39 +97,32 @@ class ASTType(Enum):
         Return enum indicating line type
         source is source code
         """
+        return cls.astTypeMatch(source)[0]
+
+    @classmethod
+    def astTypeMatch(cls, source):
+        """
+        Return tuple of enum indicating line type and the regex match
+        (or None) which the element constructor can use without reparsing.
+        Dispatches on the leading keyword so each line is matched once.
+        source is source code
+        """
         if source == '':
-            return cls.BLANK
+            return cls.BLANK, None
         if source == "OPENQASM 2.0;":
-            return cls.DECLARATION_QASM_2_0
-        x = QTRegEx.COMMENT.search(source)
-        if x:
-            return cls.COMMENT
-        x = QTRegEx.INCLUDE.search(source)
+            return cls.DECLARATION_QASM_2_0, None
+        x = QTRegEx.KEYWORD.match(source)
         if x:
-            return cls.INCLUDE
-        x = QTRegEx.CTL_2.search(source)
-        if x:
-            if x.group(1) == 'if':
-                return cls.CTL_2
-        x = QTRegEx.QREG.search(source)
-        if x:
-            return cls.QREG
-        x = QTRegEx.CREG.search(source)
-        if x:
-            return cls.CREG
-        x = QTRegEx.MEASURE.search(source)
-        if x:
-            return cls.MEASURE
-        x = QTRegEx.BARRIER.search(source)
-        if x:
-            return cls.BARRIER
-        x = QTRegEx.GATE.search(source)
-        if x:
-            return cls.GATE
-        x = QTRegEx.OP.search(source)
+            dispatch = ASTKeywordDispatch.TABLE.get(x.group(1))
+            if dispatch:
+                ast_type, regex = dispatch
+                x = regex.match(source)
+                if x:
+                    return ast_type, x
+        x = QTRegEx.OP_MATCH.match(source)
         if x:
-            return cls.OP
-        return cls.UNKNOWN
+            return cls.OP, x
+        return cls.UNKNOWN, None
 
     @classmethod
     def ast_eol_comment(cls, source):
@@ -114,12 +130,32 @@ class ASTType(Enum):
         Return an end-of-line comment if present or None if absent
         source is source code
         """
+        if '//' not in source:
+            return None
         x = QTRegEx.EOL_COMMENT.search(source)
         if x:
             x = x.group(1).strip()
         return x
 
 
+class ASTKeywordDispatch():  # pylint: disable-msg=too-few-public-methods
+    """
+    Leading keyword of a source line mapped to the AST type it
+    introduces and the regex which confirms it and captures its parts.
+    Lines with no entry here (or whose regex fails) are tried as ops.
+    """
+    TABLE = {
+        '//': (ASTType.COMMENT, QTRegEx.COMMENT),
+        'include': (ASTType.INCLUDE, QTRegEx.INCLUDE_MATCH),
+        'if': (ASTType.CTL_2, QTRegEx.CTL_2_MATCH),
+        'qreg': (ASTType.QREG, QTRegEx.QREG_MATCH),
+        'creg': (ASTType.CREG, QTRegEx.CREG_MATCH),
+        'measure': (ASTType.MEASURE, QTRegEx.MEASURE_DECL),
+        'barrier': (ASTType.BARRIER, QTRegEx.BARRIER_MATCH),
+        'gate': (ASTType.GATE, QTRegEx.GATE)
+    }
+
+
 class ASTElement():
     """
     ASTElement
@@ -207,10 +243,11 @@ class ASTElementInclude(ASTElement):
     Knows linenum, ast_type, source, include
     """
 
-    def __init__(self, filenum, linenum, source, save_element_source=False, eol_comment=None):
+    def __init__(self, filenum, linenum, source, save_element_source=False, eol_comment=None,
+                 match=None):
         super(ASTElementInclude, self).__init__(
             filenum, linenum, ASTType.INCLUDE, source, save_element_source, eol_comment)
-        x = QTRegEx.INCLUDE_TARGET.search(source)
+        x = match if match else QTRegEx.INCLUDE_MATCH.match(source)
         self.include = x.group(1)
 
     @ASTElement._eol_comment
@@ -227,10 +264,11 @@ class ASTElementQReg(ASTElement):
     Knows linenum, ast_type, source, qreg_name, qreg_num
     """
 
-    def __init__(self, filenum, linenum, source, save_element_source=False, eol_comment=None):
+    def __init__(self, filenum, linenum, source, save_element_source=False, eol_comment=None,
+                 match=None):
         super(ASTElementQReg, self).__init__(
             filenum, linenum, ASTType.QREG, source, save_element_source, eol_comment)
-        x = QTRegEx.REG_DECL.match(self.source)
+        x = match if match else QTRegEx.QREG_MATCH.match(self.source)
         self.qreg_name = x.group(1)
         self.qreg_num = x.group(2)
 
@@ -248,10 +286,11 @@ class ASTElementCReg(ASTElement):
     Knows linenum, ast_type, source, creg_name, creg_num
     """
 
-    def __init__(self, filenum, linenum, source, save_element_source=False, eol_comment=None):
+    def __init__(self, filenum, linenum, source, save_element_source=False, eol_comment=None,
+                 match=None):
         super(ASTElementCReg, self).__init__(
             filenum, linenum, ASTType.CREG, source, save_element_source, eol_comment)
-        x = QTRegEx.REG_DECL.match(self.source)
+        x = match if match else QTRegEx.CREG_MATCH.match(self.source)
         self.creg_name = x.group(1)
         self.creg_num = x.group(2)
 
@@ -269,10 +308,11 @@ class ASTElementMeasure(ASTElement):
     Knows linenum, ast_type, source, source_reg, target_reg
     """
 
-    def __init__(self, filenum, linenum, source, save_element_source=False, eol_comment=None):
+    def __init__(self, filenum, linenum, source, save_element_source=False, eol_comment=None,
+                 match=None):
         super(ASTElementMeasure, self).__init__(
             filenum, linenum, ASTType.MEASURE, source, save_element_source, eol_comment)
-        x = QTRegEx.MEASURE_DECL.match(self.source)
+        x = match if match else QTRegEx.MEASURE_DECL.match(self.source)
         self.source_reg = x.group(1)
         self.target_reg = x.group(2)
 
@@ -290,14 +330,14 @@ class ASTElementBarrier(ASTElement):
     Knows linenum, ast_type, source, reg_list
     """
 
-    def __init__(self, filenum, linenum, source, save_element_source=False, eol_comment=None):
+    def __init__(self, filenum, linenum, source, save_element_source=False, eol_comment=None,
+                 match=None):
         super(ASTElementBarrier, self).__init__(
             filenum, linenum, ASTType.BARRIER, source, save_element_source, eol_comment)
-        x = QTRegEx.BARRIER_DECL.findall(self.source)
-        if not x:  # e.g., qiskit-terra/examples/qasm/entangled_registers.qasm
-            x = QTRegEx.BARRIER_DECL_1.findall(self.source)
-            x[0] = x[0].rstrip(';')
-        self.reg_list = x[0].split(',')
+        x = match if match else QTRegEx.BARRIER_MATCH.match(self.source)
+        # Reg list may be bits or whole regs, e.g.,
+        # qiskit-terra/examples/qasm/entangled_registers.qasm
+        self.reg_list = [reg.strip() for reg in x.group(1).split(',')]
 
     @ASTElement._eol_comment
     def out(self):
@@ -313,22 +353,22 @@ class ASTElementOp(ASTElement):
     Knows linenum, ast_type, source, op, param_list, reg_list
     """
 
-    def __init__(self, filenum, linenum, source, save_element_source=False, eol_comment=None):
+    def __init__(self, filenum, linenum, source, save_element_source=False, eol_comment=None,
+                 match=None):
         super(ASTElementOp, self).__init__(
             filenum, linenum, ASTType.OP, source, save_element_source, eol_comment)
-        x = QTRegEx.OP_AND_ARGS.match(self.source)
+        x = match if match else QTRegEx.OP_MATCH.match(self.source)
         op_and_args = x.group(1)
-        x = QTRegEx.OP_PARAM_LIST.match(op_and_args)
+        self.reg_list = x.group(2).strip(';').split(',')
 
         self.param_list = None
+        x = QTRegEx.OP_PARAM_LIST.match(op_and_args) if '(' in op_and_args else None
         if x:
             self.op = x.group(1)
             self.param_list = x.group(2).split(',')
         else:
             self.op = op_and_args
 
-        self.reg_list = self.proc_reg_list(self.source)
-
     @ASTElement._eol_comment
     def out(self):
         return {'filenum': self.filenum, 'linenum': self.linenum, 'type': self.ast_type,
@@ -345,25 +385,18 @@ class ASTElementCtl2(ASTElement):
     expression_param_list, op, param_list, reg_list
     """
 
-    def __init__(self, filenum, linenum, source, save_element_source=False, eol_comment=None):
+    def __init__(self, filenum, linenum, source, save_element_source=False, eol_comment=None,
+                 match=None):
         super(ASTElementCtl2, self).__init__(
             filenum, linenum, ASTType.CTL_2, source, save_element_source, eol_comment)
-        x = QTRegEx.CTL_2.match(self.source)
+        x = match if match else QTRegEx.CTL_2_MATCH.match(self.source)
         self.ctl = x.group(1)
         self.expression_op = x.group(3)
         self.expression_param_list = [x.group(2), x.group(4)]
 
-        op_and_args = x.group(5)
-        x = QTRegEx.OP_PARAM_LIST.match(op_and_args)
-
+        self.op = x.group(5)
         self.param_list = None
-        if x:
-            self.op = x.group(1)
-            self.param_list = x.group(2).split(',')
-        else:
-            self.op = op_and_args
-
-        self.reg_list = self.proc_reg_list(self.source)
+        self.reg_list = [x.group(6)]
 
     @ASTElement._eol_comment
     def out(self):
@@ -480,6 +513,114 @@ class C_Sect():
         self.c_sect = []
 
 
+class Compact_C_Sect():
+    """
+    Compact code section of translation unit, stored as struct of arrays.
+    Ops, measures and barriers are held as integer type codes, packed
+    file/line numbers and interned operand ids. Other elements are kept
+    as their dict. Comments, gate declaration placeholders, element
+    source and end-of-line comments are not kept at all.
+    Indexing and iteration give back dicts like those in a C_Sect.
+    """
+
+    OMITTED = (ASTType.COMMENT, ASTType.GATE, ASTType.BLANK)
+
+    def __init__(self):
+        """Instance structures filled in by QasmTranslator"""
+        self.types = array('H')
+        self.locations = array('Q')
+        self.ops = array('L')
+        self.param_offsets = array('L', [0])
+        self.params = array('L')
+        self.reg_offsets = array('L', [0])
+        self.regs = array('L')
+        self.others = {}
+        self.symbols = ['']
+        self.symbol_ids = {'': 0}
+
+    def _intern(self, symbol):
+        """Return id of symbol string, adding it if new"""
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.symbols)
+            self.symbols.append(symbol)
+            self.symbol_ids[symbol] = symbol_id
+        return symbol_id
+
+    def _symbol_list(self, symbol_ids, start, end):
+        """Return list of symbols for a range of ids or None if empty range"""
+        if start == end:
+            return None
+        symbols = self.symbols
+        return [symbols[i] for i in symbol_ids[start:end]]
+
+    def append(self, entry):
+        """Append a c_sect dict entry, storing only what translation needs"""
+        ast_type = entry['type']
+        if ast_type in self.OMITTED:
+            return
+        idx = len(self.types)
+        self.types.append(ast_type.value)
+        self.locations.append(entry['filenum'] << 32 | entry['linenum'])
+        op_id = 0
+        reg_list = None
+        if ast_type is ASTType.OP:
+            op_id = self._intern(entry['op'])
+            if entry['param_list']:
+                self.params.extend([self._intern(x) for x in entry['param_list']])
+            reg_list = entry['reg_list']
+        elif ast_type is ASTType.MEASURE:
+            reg_list = (entry['source_reg'], entry['target_reg'])
+        elif ast_type is ASTType.BARRIER:
+            reg_list = entry['reg_list']
+        else:
+            entry = dict(entry)
+            entry.pop('eol_comment', None)
+            if 'source' in entry:
+                entry['source'] = None
+            self.others[idx] = entry
+        if reg_list:
+            self.regs.extend([self._intern(x) for x in reg_list])
+        self.ops.append(op_id)
+        self.param_offsets.append(len(self.params))
+        self.reg_offsets.append(len(self.regs))
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, n):
+        """Materialize nth entry as a dict"""
+        if n < 0:
+            n += len(self.types)
+        entry = self.others.get(n)
+        if entry is not None:
+            return entry
+        ast_type = ASTType(self.types[n])
+        location = self.locations[n]
+        entry = {'filenum': location >> 32, 'linenum': location & 0xFFFFFFFF,
+                 'type': ast_type, 'source': None}
+        reg_list = self._symbol_list(self.regs, self.reg_offsets[n], self.reg_offsets[n + 1])
+        if ast_type is ASTType.OP:
+            entry['op'] = self.symbols[self.ops[n]]
+            entry['param_list'] = self._symbol_list(self.params,
+                                                    self.param_offsets[n],
+                                                    self.param_offsets[n + 1])
+            entry['reg_list'] = reg_list
+        elif ast_type is ASTType.MEASURE:
+            entry['source_reg'] = reg_list[0]
+            entry['target_reg'] = reg_list[1]
+        else:
+            entry['reg_list'] = reg_list
+        return entry
+
+    def __iter__(self):
+        for n in range(len(self.types)):
+            yield self[n]
+
+    def __repr__(self):
+        return repr(list(self))
+
+
 class G_Sect():
     """User gate definition section of translation unit"""
 
@@ -507,31 +648,351 @@ class S_Sect():
 # ##################################
 
 
+class Source_File():  # pylint: disable-msg=too-few-public-methods
+    """
+    The stripped lines of a source file.
+    File is opened when iteration starts and closed after the last line.
+    """
+
+    def __init__(self, filepath):
+        """filepath ... path of source file"""
+        self.filepath = filepath
+
+    def __iter__(self):
+        with open(self.filepath, 'r') as file_handle:
+            for line in file_handle:
+                yield line.strip()
+
+
+class Source_Buffer():
+    """
+    Source of a file retained as one read-only buffer of UTF-8 bytes
+    and the offset at which each line starts, rather than as a list of
+    lines. Reads as a sequence of stripped lines, a line only being
+    decoded when it is read.
+    A buffer started empty is appended to line by line, e.g., as a
+    stream is read.
+    """
+
+    def __init__(self, data=None, offsets=None):
+        """
+        data ... bytes of source, or None to start an empty buffer to append to
+        offsets ... array of offsets in data at which each line starts,
+            followed by the length of data
+        """
+        if data is None:
+            data = bytearray()
+            offsets = array('Q', [0])
+        self.data = data
+        self.offsets = offsets
+
+    @staticmethod
+    def fromFile(filepath):
+        """Read a file into a Source_Buffer"""
+        with open(filepath, 'rb') as file_handle:
+            data = file_handle.read()
+        offsets = array('Q', [0])
+        newline = data.find(b'\n')
+        while newline >= 0:
+            offsets.append(newline + 1)
+            newline = data.find(b'\n', newline + 1)
+        if offsets[-1] != len(data):  # Last line has no line end
+            offsets.append(len(data))
+        return Source_Buffer(data, offsets)
+
+    @staticmethod
+    def fromLines(qasmsourcelines):
+        """Copy stripped source lines into a Source_Buffer"""
+        source_buffer = Source_Buffer()
+        for line in qasmsourcelines:
+            source_buffer.append(line.strip())
+        source_buffer.data = bytes(source_buffer.data)
+        return source_buffer
+
+    def append(self, line):
+        """Append a stripped line"""
+        self.data += line.encode('utf-8')
+        self.data += b'\n'
+        self.offsets.append(len(self.data))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, n):
+        """Decode nth line, or a list of lines for a slice"""
+        if isinstance(n, slice):
+            return [self[i] for i in range(*n.indices(len(self)))]
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError('Source_Buffer index out of range')
+        return self.data[self.offsets[n]:self.offsets[n + 1]].decode('utf-8').strip()
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self[n]
+
+    def __eq__(self, other):
+        if isinstance(other, (Source_Buffer, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __getstate__(self):
+        return {'data': bytes(self.data), 'offsets': self.offsets}
+
+
+class Source_Span():
+    """
+    Source of a statement retained as the place in a Source_Buffer
+    where it starts and the line where it ends. The text, as the
+    translator saw it, is only made when it is read by str().
+    """
+
+    __slots__ = ('source_buffer', 'linenum', 'column', 'end_linenum')
+
+    def __init__(self, source_buffer, linenum, column, end_linenum):
+        """
+        source_buffer ... Source_Buffer of the file
+        linenum ... line on which statement starts
+        column ... offset in that (stripped) line at which statement starts
+        end_linenum ... line on which statement ends
+        """
+        self.source_buffer = source_buffer
+        self.linenum = linenum
+        self.column = column
+        self.end_linenum = end_linenum
+
+    def __str__(self):
+        """Lex the statement again from its lines"""
+        lexer = Statement_Lexer()
+        for linenum in range(self.linenum, self.end_linenum + 1):
+            line = self.source_buffer[linenum]
+            if linenum == self.linenum:
+                line = line[self.column:].strip()
+            if line:
+                statements = lexer.lex(linenum, line)
+                if statements:
+                    text = statements[0][2]
+                    break
+        else:  # Unfinished at end of source
+            text = lexer.flush()[2]
+        text = text.replace(', ', ',')
+        return text.replace(' ;', ';')
+
+    def __eq__(self, other):
+        if isinstance(other, (Source_Span, str)):
+            return str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self):
+        return repr(str(self))
+
+
+def materialize_source(translation):
+    """
+    Return a copy of a translation in which retained source is plain
+    text, Source_Buffer as list of lines and Source_Span as string,
+    e.g., to print it. Returns translation itself if there is none.
+    """
+    def plain(entry):
+        source = entry.get('source')
+        if isinstance(source, (Source_Buffer, Source_Span)):
+            entry = dict(entry, source=list(source) if isinstance(source, Source_Buffer)
+                         else str(source))
+        return entry
+
+    s_sect = translation.get('s_sect') or []
+    if not any(isinstance(body['source'], Source_Buffer) for body in s_sect) and \
+            not any(isinstance(entry.get('source'), Source_Span)
+                    for section in ('c_sect', 'g_sect')
+                    for entry in translation[section]):
+        return translation
+    materialized = dict(translation)
+    for section in ('c_sect', 'g_sect', 's_sect'):
+        if translation[section] is not None:
+            materialized[section] = [plain(entry) for entry in translation[section]]
+    return materialized
+
+
+class Statement_Lexer():
+    """
+    Splits source lines into statements wherever the line breaks fall.
+    A statement ends with ';' or, once a gate body has opened with '{',
+    with '}'. Statements spanning lines are joined with a space.
+    A '//' comment alone on its line is a statement of its own, one
+    following the last statement on a line stays part of that statement
+    (as an end-of-line comment), and one inside an unfinished statement
+    is dropped.
+    """
+
+    def __init__(self):
+        """Start with no statement pending"""
+        self.fragments = []
+        self.start_linenum = None
+        self.start_column = None
+        self.end_linenum = None
+        self.in_body = False
+
+    def _complete(self, linenum, tail):
+        """Return (start linenum, end linenum, text) of statement ending with tail"""
+        tail = tail.strip()
+        if not self.fragments:
+            return linenum, linenum, tail
+        self.fragments.append(tail)
+        statement = (self.start_linenum, linenum, ' '.join(self.fragments))
+        self.fragments = []
+        return statement
+
+    def lex(self, linenum, line, columns=None):
+        """
+        Lex stripped source line number linenum.
+        Return list of (start linenum, end linenum, text) of statements
+        completed in the line.
+        columns ... if not None, list to which is appended the offset in
+            its start line at which each statement completed starts
+        """
+        if not self.fragments and line.endswith(';') and line.find(';') == len(line) - 1 \
+                and '{' not in line and '}' not in line and '//' not in line:
+            if columns is not None:
+                columns.append(0)
+            return [(linenum, linenum, line)]  # The usual case, one line one statement
+        self.end_linenum = linenum
+        comment_at = line.find('//')
+        code = line if comment_at < 0 else line[:comment_at]
+        statements = []
+        start = 0
+        for x in QTRegEx.STATEMENT_PUNCT.finditer(code):
+            punct = x.group(0)
+            if punct == '{':
+                self.in_body = True
+            elif punct == '}' or not self.in_body:
+                self.in_body = False
+                if columns is not None:
+                    columns.append(self.start_column if self.fragments else start)
+                statements.append(self._complete(linenum, code[start:x.end()]))
+                start = x.end()
+        rest = code[start:].strip()
+        if rest:
+            if not self.fragments:
+                self.start_linenum = linenum
+                self.start_column = start
+            self.fragments.append(rest)
+        elif comment_at >= 0:
+            if statements:
+                start_linenum, end_linenum, text = statements[-1]
+                statements[-1] = (start_linenum, end_linenum, text + line[start:].rstrip())
+            elif not self.fragments:
+                if columns is not None:
+                    columns.append(comment_at)
+                statements.append((linenum, linenum, line[comment_at:]))
+        return statements
+
+    def flush(self):
+        """
+        At end of source return (start linenum, end linenum, text) of
+        any unfinished statement, else None.
+        """
+        if not self.fragments:
+            return None
+        statement = (self.start_linenum, self.end_linenum, ' '.join(self.fragments))
+        self.fragments = []
+        self.in_body = False
+        return statement
+
+
 class Source_Frame():
     """
     A pushable frame defining the source we are processing
     """
 
-    def __init__(self, filenum, qasmsourcelines):
+    def __init__(self, filenum, qasmsourcelines, saved_lines=None, source_buffer=None):
         """
         filenum ... index of filepath in t_sect filepaths vector
-        qasmsourcelines ... source lines vector
+        qasmsourcelines ... source lines vector or Source_Buffer, or any iterable
+            of lines (e.g., an open file) which is then read only as lines are needed
+        saved_lines ... if not None, list or Source_Buffer to which lines
+            read lazily are appended
+        source_buffer ... if not None, Source_Buffer holding the source, in
+            which case the column at which each statement starts is kept
         Init counter to 0
         """
         self.filenum = filenum
         self.qasmsourcelines = qasmsourcelines
         self.linenum = 0
+        self.lazy = not isinstance(qasmsourcelines, (list, tuple, Source_Buffer))
+        self.source_iter = iter(qasmsourcelines) if self.lazy else None
+        self.saved_lines = saved_lines
+        self.last_line = None
+        self.lexer = Statement_Lexer()
+        self.statements = deque()
+        self.source_buffer = source_buffer
+        self.columns = deque() if source_buffer is not None else None
+        self.column = None
 
     def next(self):
         """ Return next source line and increment counter"""
         source = None
-        if self.linenum < len(self.qasmsourcelines):
+        if self.lazy:
+            source = next(self.source_iter, None)
+            if source is not None:
+                source = source.strip()
+                if self.saved_lines is not None:
+                    self.saved_lines.append(source)
+                self.last_line = source
+                self.linenum += 1
+        elif self.linenum < len(self.qasmsourcelines):
             source = self.qasmsourcelines[self.linenum]
             self.linenum += 1
         return source
 
+    def next_statement(self):
+        """
+        Return (start linenum, end linenum, text) of next source statement
+        or (None, None, None) at end of source
+        """
+        while not self.statements:
+            linenum = self.linenum
+            line = self.next()
+            if line is None:
+                self.column = self.lexer.start_column
+                statement = self.lexer.flush()
+                return statement if statement else (None, None, None)
+            if line:
+                self.statements.extend(self.lexer.lex(linenum, line, self.columns))
+        if self.columns is not None:
+            self.column = self.columns.popleft()
+        return self.statements.popleft()
+
+    def push_back_statement(self, statement):
+        """Return (start linenum, end linenum, text) of statement last read to be read again"""
+        self.statements.appendleft(statement)
+        if self.columns is not None:
+            self.columns.appendleft(self.column)
+
+    def source_span(self, linenum, end_linenum):
+        """
+        Return Source_Span of the statement last read, from linenum to
+        end_linenum, or None if source isn't kept in a Source_Buffer
+        """
+        if self.source_buffer is None:
+            return None
+        return Source_Span(self.source_buffer, linenum, self.column, end_linenum)
+
     def nth_qasmline(self, n):
-        """Return nth qasm source line"""
+        """
+        Return nth qasm source line
+        A lazy frame only knows the line most recently read.
+        """
+        if self.lazy:
+            return self.last_line if n == self.linenum - 1 else None
         return self.qasmsourcelines[n] if n < len(self.qasmsourcelines) else None
 
 
@@ -542,13 +1003,15 @@ class Source_Frame_Stack():
         """Create the stack"""
         self.frames = []
 
-    def push(self, filenum, qasmsourcelines):
+    def push(self, filenum, qasmsourcelines, saved_lines=None, source_buffer=None):
         """
         Create and push a frame
         filenum ... index of filepath in t_sect filepaths vector
-        qasmsourcelines ... source lines vector
+        qasmsourcelines ... source lines vector or iterable of lines
+        saved_lines ... if not None, list to which lines read lazily are appended
+        source_buffer ... if not None, Source_Buffer holding the source
         """
-        self.frames.append(Source_Frame(filenum, qasmsourcelines))
+        self.frames.append(Source_Frame(filenum, qasmsourcelines, saved_lines, source_buffer))
 
     def pop(self):
         """Lose top frame"""
@@ -562,6 +1025,14 @@ class Source_Frame_Stack():
         """Return next line in source from top frame or None"""
         return self.filenum(), self.linenum(), self.tos().next()
 
+    def next_statement(self):
+        """
+        Return filenum, start linenum, end linenum and next statement
+        from top frame, statement None at end of frame
+        """
+        tos = self.tos()
+        return (tos.filenum,) + tos.next_statement()
+
     def depth(self):
         """Depth of stack"""
         return len(self.frames)
@@ -578,6 +1049,259 @@ class Source_Frame_Stack():
         return self.tos().nth_qasmline(n)
 
 
+# #######################################
+# Process-wide cache of parsed includes
+# #######################################
+
+
+class Cached_Include():
+    """
+    What translating an include file contributed to a translation unit.
+    Filenums are relative to the include file, which is filenum 0,
+    files it includes in turn following in order of inclusion.
+    """
+
+    def __init__(self, key, depth, base_filenum):
+        """
+        key ... Include_Cache key
+        depth ... source frame stack depth of the include while recording
+        base_filenum ... filenum of include file in recording translation
+        """
+        self.key = key
+        self.depth = depth
+        self.base_filenum = base_filenum
+        self.filestamps = []
+        self.realpaths = []
+        self.entries = []
+        self.s_sect = []
+        self.cacheable = True
+
+    def record(self, section, entry):
+        """
+        Record a c_sect or g_sect entry with filenum made relative,
+        ignoring the include directive itself which precedes the include.
+        """
+        filenum = entry['filenum'] - self.base_filenum
+        if filenum >= 0:
+            self.entries.append((section, dict(entry, filenum=filenum)))
+
+
+class Include_Cache():
+    """
+    LRU cache of Cached_Include keyed by resolved include filepath and
+    the translator options that affect its translation.
+    An entry is valid only while the modification time and size of
+    the include file and of every file it includes are unchanged.
+    """
+
+    def __init__(self, maxsize=64):
+        """maxsize ... number of entries kept, 0 disables caching"""
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def filestamp(filepath):
+        """Return (mtime, size) of filepath or None if it can't be stat'ed"""
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, key):
+        """Return valid Cached_Include for key or None"""
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None:
+                self.entries.move_to_end(key)
+        if cached is not None:
+            for filepath, stamp in cached.filestamps:
+                if self.filestamp(filepath) != stamp:
+                    with self.lock:
+                        self.entries.pop(key, None)
+                    cached = None
+                    break
+        with self.lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return cached
+
+    def put(self, cached):
+        """Add a Cached_Include, evicting least recently used if full"""
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[cached.key] = cached
+            self.entries.move_to_end(cached.key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Empty the cache"""
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+INCLUDE_CACHE = Include_Cache()
+
+
+class Include_Index():
+    """
+    Index of include file search results, kept per include path string,
+    so the include path is only searched the first time a file is included.
+    Found files are checked still to be readable each time they are looked
+    up; a file which has gone is searched for again.
+    Call clear() if a file is added to an include path directory
+    ahead of one already found.
+    """
+
+    def __init__(self):
+        """Start empty"""
+        self.found = {}
+        self.realpaths = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def search(include_path, filepath):
+        """Search include path for filepath, return completed filepath or None"""
+        for idir in include_path.split(os.pathsep):
+            ipath = idir + os.path.sep + filepath
+            if os.path.exists(ipath):
+                return ipath
+        return None
+
+    def find(self, include_path, filepath):
+        """Return completed filepath of filepath on include path or None"""
+        key = (include_path, filepath)
+        with self.lock:
+            found = self.found.get(key)
+        if found is not None:
+            if os.access(found, os.R_OK):
+                return found
+            with self.lock:
+                self.found.pop(key, None)
+        found = self.search(include_path, filepath)
+        if found is not None and os.access(found, os.R_OK):
+            with self.lock:
+                self.found[key] = found
+        return found
+
+    def realpath(self, filepath):
+        """Return memoized real path of filepath found on an include path"""
+        with self.lock:
+            realpath = self.realpaths.get(filepath)
+        if realpath is None:
+            realpath = os.path.realpath(filepath)
+            with self.lock:
+                self.realpaths[filepath] = realpath
+        return realpath
+
+    def clear(self):
+        """Empty the index"""
+        with self.lock:
+            self.found.clear()
+            self.realpaths.clear()
+
+
+INCLUDE_INDEX = Include_Index()
+
+
+# ######################
+# Translation statistics
+# ######################
+
+
+class Translation_Stats():
+    """
+    Wall time of each phase of a translation and counts of what was
+    translated, collected by QasmTranslator(stats=True).
+    Counts are of source lines and bytes, statements, includes, reuses of
+    cached translations (AstCache or Include_Cache), gate definitions,
+    and c_sect elements by ASTType.
+    Phases:
+        read ... reading source and lexing it into statements
+        classify ... finding the type of each statement
+        element ... building code elements
+        include ... finding and pushing include files, splicing cached ones
+        gate ... parsing gate definitions
+    Phase times of a parallel translation are summed over its worker
+    processes, so may add up to more than total_time.
+    """
+
+    PHASES = ('read', 'classify', 'element', 'include', 'gate')
+
+    def __init__(self):
+        """All times and counts zero"""
+        self.times = dict.fromkeys(self.PHASES, 0.0)
+        self.total_time = 0.0
+        self.lines = 0
+        self.bytes = 0
+        self.statements = 0
+        self.includes = 0
+        self.cache_hits = 0
+        self.gates = 0
+        self.elements = Counter()
+        self.mark = 0.0
+
+    def start(self):
+        """Start timing a phase"""
+        self.mark = time.perf_counter()
+
+    def lap(self, phase):
+        """Add the time since start() or the last lap() to phase"""
+        now = time.perf_counter()
+        self.times[phase] += now - self.mark
+        self.mark = now
+
+    def end_source(self, frame):
+        """Count the lines and bytes of a Source_Frame read to its end"""
+        self.lines += frame.linenum
+        source = frame.qasmsourcelines
+        if isinstance(source, Source_File):
+            self.bytes += os.path.getsize(source.filepath)
+        elif isinstance(source, Source_Buffer):
+            self.bytes += len(source.data)
+        elif isinstance(source, (list, tuple)):
+            self.bytes += sum(len(line) + 1 for line in source)
+        elif frame.saved_lines is not None:
+            self.bytes += len(frame.saved_lines.data)
+
+    def merge(self, other):
+        """Add in another Translation_Stats, e.g., from a worker process"""
+        for phase in self.PHASES:
+            self.times[phase] += other.times[phase]
+        self.lines += other.lines
+        self.bytes += other.bytes
+        self.statements += other.statements
+        self.includes += other.includes
+        self.cache_hits += other.cache_hits
+        self.gates += other.gates
+        self.elements.update(other.elements)
+
+    def as_dict(self):
+        """Return stats as a dict of plain values, element counts keyed by ASTType name"""
+        return {'times': dict(self.times),
+                'total_time': self.total_time,
+                'lines': self.lines,
+                'bytes': self.bytes,
+                'statements': self.statements,
+                'includes': self.includes,
+                'cache_hits': self.cache_hits,
+                'gates': self.gates,
+                'elements': {ast_type.name: count for ast_type, count in self.elements.items()},
+                'lines_per_second': self.lines / self.total_time if self.total_time else None}
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+
 # ##############
 # The Translator
 # ##############
@@ -593,11 +1317,17 @@ class QasmTranslator():
                  save_pgm_source=False, save_element_source=False,
                  save_gate_source=False,
                  show_gate_decls=False,
-                 include_path='.'):
+                 include_path='.',
+                 compact=False,
+                 include_cache=True,
+                 cache_dir=None,
+                 workers=1,
+                 stats=False):
         """
         Init from source lines in an array.
         Does not read in from file, expects code handed to it.
-        qasmsourcelines = the source code
+        qasmsourcelines = the source code, a list of lines or any iterable
+            of lines (e.g., an open file) which is read as translation proceeds
         name = user-defined name for translation unit
         no_unknown = True if raises on unknown element
         filepath = source code filepath (informational only)
@@ -606,6 +1336,15 @@ class QasmTranslator():
         save_gate_source = True if user gate source should be embedded in output
         show_gate_decls = True if gate declaration should be noted in c_sect
         include_path is path for include file search
+        compact = True if c_sect should be a Compact_C_Sect
+        include_cache = True to reuse translations of include files held in
+            the process-wide INCLUDE_CACHE, or an Include_Cache, or False
+        cache_dir = directory of an AstCache from which translate() reuses
+            the translation of identical source and includes, or None
+        workers = number of processes among which translate() divides the
+            body of a large program, 1 to translate in this process only
+        stats = True to collect a Translation_Stats in self.stats,
+            else self.stats is None
         """
 
         # Control factors
@@ -615,10 +1354,27 @@ class QasmTranslator():
         self.save_gate_source = save_gate_source
         self.show_gate_decls = show_gate_decls
         self.include_path = include_path
+        if include_cache is True:
+            include_cache = INCLUDE_CACHE
+        self.include_cache = include_cache if include_cache else None
+        self.include_stamps = {}
+        self.include_realpaths = {}
+        self.included = set()
+        if filepath:
+            self.included.add(os.path.realpath(filepath))
+        self.include_recordings = []
+        self.cache_dir = cache_dir
+        self.compact = compact
+        self.workers = workers
+        self.stats = Translation_Stats() if stats else None
+        self.qasmsourcelines = qasmsourcelines
+        self.seen_noncomment = False
+        self.stop_at_body = False
+        self.body_linenum = None
 
         # Init sections
         self.t_sect = T_Sect(name)
-        self.c_sect = C_Sect()
+        self.c_sect = Compact_C_Sect() if compact else C_Sect()
         self.g_sect = G_Sect()
 
         if save_pgm_source is None:
@@ -628,7 +1384,7 @@ class QasmTranslator():
 
         self.translation = {
             't_sect': self.t_sect.t_sect,
-            'c_sect': self.c_sect.c_sect,
+            'c_sect': self.c_sect if compact else self.c_sect.c_sect,
             'g_sect': self.g_sect.g_sect,
             's_sect': self.s_sect.s_sect
         }
@@ -643,10 +1399,18 @@ class QasmTranslator():
                        save_pgm_source=False, save_element_source=False,
                        save_gate_source=False,
                        show_gate_decls=False,
-                       include_path='.'):
+                       include_path='.',
+                       lazy=False,
+                       compact=False,
+                       include_cache=True,
+                       cache_dir=None,
+                       workers=1,
+                       stats=False):
         """
         Instance QasmTranslator from a file handle reading in all lines.
         Does not close file handle.
+        If lazy, lines are not read in now but as translation proceeds,
+        so file handle must remain open until translation is done.
         file_handle = open read file containing qasm source
         name = user-defined name for translation unit
         no_unknown = True if raises on unknown element
@@ -657,17 +1421,31 @@ class QasmTranslator():
         save_gate_source = True if user gate source should be embedded in output
         show_gate_decls = True if gate declaration should be noted in c_sect
         include_path is path for include file search
+        lazy = True if lines are to be read only as translation proceeds
+        compact = True if c_sect should be a Compact_C_Sect
+        include_cache = True, an Include_Cache, or False (see __init__)
+        cache_dir = directory of on-disk translation cache or None (see __init__)
+        workers = number of processes translating body of program (see __init__)
+        stats = True to collect a Translation_Stats (see __init__)
         """
-        qasmsourcelines = []
-        for line in file_handle:
-            qasmsourcelines.append(line.strip())
+        if lazy:
+            qasmsourcelines = file_handle
+        else:
+            qasmsourcelines = []
+            for line in file_handle:
+                qasmsourcelines.append(line.strip())
         qt = QasmTranslator(qasmsourcelines, name=name, filepath=filepath,
                             no_unknown=no_unknown,
                             save_pgm_source=save_pgm_source,
                             save_element_source=save_element_source,
                             save_gate_source=save_gate_source,
                             show_gate_decls=show_gate_decls,
-                            include_path=include_path)
+                            include_path=include_path,
+                            compact=compact,
+                            include_cache=include_cache,
+                            cache_dir=cache_dir,
+                            workers=workers,
+                            stats=stats)
         return qt
 
     @staticmethod
@@ -676,10 +1454,16 @@ class QasmTranslator():
                  save_pgm_source=False, save_element_source=False,
                  save_gate_source=False,
                  show_gate_decls=False,
-                 include_path='.'):
+                 include_path='.',
+                 compact=False,
+                 include_cache=True,
+                 cache_dir=None,
+                 workers=1,
+                 stats=False):
         """
         Instance QasmTranslator from a filepath.
-        Opens file 'r' reading in all lines and closes file.
+        File is opened 'r' when translation starts, read as translation
+        proceeds, and closed when all lines have been read.
         filepath = source code filepath for loading and informational
         no_unknown = True if raises on unknown element
         save_pgm_source = True if program source should be embedded in output
@@ -687,30 +1471,58 @@ class QasmTranslator():
         save_gate_source = True if user gate source should be embedded in output
         show_gate_decls = True if gate declaration should be noted in c_sect
         include_path is path for include file search
+        compact = True if c_sect should be a Compact_C_Sect
+        include_cache = True, an Include_Cache, or False (see __init__)
+        cache_dir = directory of on-disk translation cache or None (see __init__)
+        workers = number of processes translating body of program (see __init__)
+        stats = True to collect a Translation_Stats (see __init__)
         """
         if not os.path.exists(filepath) or not os.access(filepath, os.R_OK):
             raise Qasm_Cannot_Read_File_Exception(None, None, None, None, filepath)
-        qasmsourcelines = []
-        file_handle = open(filepath, 'r')
-        for line in file_handle:
-            qasmsourcelines.append(line.strip())
-        file_handle.close()
-        qt = QasmTranslator(qasmsourcelines, name=name, filepath=filepath,
+        qt = QasmTranslator(QasmTranslator.read_lines(filepath), name=name, filepath=filepath,
                             no_unknown=no_unknown,
                             save_pgm_source=save_pgm_source,
                             save_element_source=save_element_source,
                             save_gate_source=save_gate_source,
                             show_gate_decls=show_gate_decls,
-                            include_path=include_path)
+                            include_path=include_path,
+                            compact=compact,
+                            include_cache=include_cache,
+                            cache_dir=cache_dir,
+                            workers=workers,
+                            stats=stats)
         return qt
 
+    @staticmethod
+    def read_lines(filepath):
+        """
+        Return the stripped lines of a file as a Source_File to be read lazily.
+        File is opened on the first line wanted and closed after the last.
+        """
+        return Source_File(filepath)
+
     def push_source(self, filepath, qasmsourcelines):
-        """Add filepath, push source frame stack, and save source if wanted"""
+        """
+        Add filepath, push source frame stack, and save source if wanted.
+        Source which is saved, whether for the program, elements or gates,
+        is kept once in a Source_Buffer which the frame then reads.
+        """
         filenum = self.t_sect.append_filepath(filepath)
-        self.source_frame_stack.push(filenum, qasmsourcelines)
-        if self.save_pgm_source:
-            self.s_sect.append(Source_Body(
-                filenum, qasmsourcelines).source_body)
+        saved_lines = None
+        source_buffer = None
+        if self.save_pgm_source or self.save_element_source or self.save_gate_source:
+            if isinstance(qasmsourcelines, Source_File):
+                source_buffer = qasmsourcelines = Source_Buffer.fromFile(qasmsourcelines.filepath)
+            elif isinstance(qasmsourcelines, (list, tuple)):
+                source_buffer = qasmsourcelines = Source_Buffer.fromLines(qasmsourcelines)
+            else:  # Lazy source, keep lines as they are read
+                source_buffer = saved_lines = Source_Buffer()
+            if self.save_pgm_source:
+                self.s_sect.append(Source_Body(
+                    filenum, source_buffer).source_body)
+        self.source_frame_stack.push(filenum, qasmsourcelines, saved_lines,
+                                     source_buffer if self.save_element_source or
+                                     self.save_gate_source else None)
 
     def filenum(self):
         """Return the current filenum"""
@@ -729,17 +1541,13 @@ class QasmTranslator():
         Search include path for filepath
         Return completed filepath if found else None
         """
-        found = None
-        include_dirs = self.include_path.split(os.pathsep)
-        for idir in include_dirs:
-            ipath = idir + os.path.sep + filepath
-            if os.path.exists(ipath):
-                found = ipath
-                break
-        return found
+        return INCLUDE_INDEX.find(self.include_path, filepath)
 
-    def push_include(self, filepath):
-        """Open an include file, read it, close it, push source"""
+    def resolve_include(self, filepath):
+        """
+        Search include path for filepath
+        Return completed filepath, raising if not found or not readable
+        """
         found = self.find_include(filepath)
         if not found:
             raise Qasm_Cannot_Find_File_Exception(self.filenum(),
@@ -758,12 +1566,105 @@ class QasmTranslator():
                                                   self.nth_qasmline(
                                                       self.linenum() - 1),
                                                   filepath)
-        qasmsourcelines = []
-        file_handle = open(filepath, 'r')
-        for line in file_handle:
-            qasmsourcelines.append(line.strip())
-        file_handle.close()
-        self.push_source(filepath, qasmsourcelines)
+        return filepath
+
+    def push_include(self, filepath):
+        """
+        Find an include file and push its source to be read as translation proceeds.
+        A file is included only once, however its include path is spelled;
+        later includes of the same real file are ignored.
+        If the include cache holds a valid translation of the file, nothing
+        is pushed and the Cached_Include is returned for splice_include().
+        Otherwise returns None and the translation is recorded for the cache.
+        """
+        filepath = self.resolve_include(filepath)
+        realpath = INCLUDE_INDEX.realpath(filepath)
+        if realpath in self.included:
+            filepaths = self.get_filepaths()
+            for recording in self.include_recordings:
+                if realpath not in (self.include_realpaths.get(filenum) for filenum
+                                    in range(recording.base_filenum, len(filepaths))):
+                    recording.cacheable = False  # Translation depends on what came before
+            return None
+        key = None
+        if self.include_cache is not None:
+            key = (filepath, self.include_path, self.no_unknown,
+                   self.save_pgm_source, self.save_element_source,
+                   self.save_gate_source, self.show_gate_decls)
+            cached = self.include_cache.get(key)
+            if cached is not None and self.included.isdisjoint(cached.realpaths):
+                self.included.update(cached.realpaths)
+                return cached
+        stamp = Include_Cache.filestamp(filepath)
+        self.included.add(realpath)
+        self.push_source(filepath, self.read_lines(filepath))
+        filenum = self.filenum()
+        self.include_realpaths[filenum] = realpath
+        if key is not None:
+            self.include_stamps[filenum] = stamp
+            self.include_recordings.append(
+                Cached_Include(key, self.source_frame_stack.depth(), filenum))
+        return None
+
+    def record_include(self, section, entry):
+        """Record an element yielded by translation to includes being recorded"""
+        for recording in self.include_recordings:
+            recording.record(section, entry)
+
+    def end_include(self):
+        """
+        Called when a source frame has been popped. If it was an include
+        being recorded, add the recording to the include cache.
+        """
+        if not self.include_recordings or \
+                self.include_recordings[-1].depth <= self.source_frame_stack.depth():
+            return
+        cached = self.include_recordings.pop()
+        if not cached.cacheable:
+            return
+        base_filenum = cached.base_filenum
+        filepaths = self.get_filepaths()
+        for filenum in range(base_filenum, len(filepaths)):
+            stamp = self.include_stamps.get(filenum)
+            if stamp is None:
+                return
+            cached.filestamps.append((filepaths[filenum], stamp))
+            cached.realpaths.append(self.include_realpaths[filenum])
+        if self.save_pgm_source:
+            for body in self.get_s_sect():
+                if body['filenum'] >= base_filenum:
+                    cached.s_sect.append(dict(body, filenum=body['filenum'] - base_filenum))
+        self.include_cache.put(cached)
+
+    def splice_include(self, cached, retain=True):
+        """
+        Generator splicing a Cached_Include into the translation,
+        yielding its elements as iter_translate() does.
+        """
+        base_filenum = len(self.get_filepaths())
+        for (filepath, stamp), realpath in zip(cached.filestamps, cached.realpaths):
+            filenum = self.t_sect.append_filepath(filepath)
+            self.include_stamps[filenum] = stamp
+            self.include_realpaths[filenum] = realpath
+        if self.save_pgm_source:
+            for body in cached.s_sect:
+                self.s_sect.append(dict(body, filenum=body['filenum'] + base_filenum))
+        stats = self.stats
+        if stats:
+            stats.cache_hits += 1
+        for section, entry in cached.entries:
+            entry = dict(entry, filenum=entry['filenum'] + base_filenum)
+            if section == 'c_sect':
+                if retain:
+                    self.append_ast(entry)
+                if stats:
+                    stats.elements[entry['type']] += 1
+            else:
+                self.append_user_gate(entry)
+                if stats:
+                    stats.gates += 1
+            self.record_include(section, entry)
+            yield section, entry
 
     def append_ast(self, ast):
         """
@@ -775,8 +1676,13 @@ class QasmTranslator():
         """Append a user gate definition to the user_gates output list"""
         self.translation['g_sect'].append(user_gate)
 
-    def user_gate_definition(self, filenum, linenum, txt):
-        """Internal routine to parse and append a user gate definition"""
+    def user_gate_definition(self, filenum, linenum, txt, span=None):
+        """
+        Internal routine to parse and append a user gate definition
+        span = Source_Span, or in a worker its tuple, kept as gate source
+            instead of txt, or None
+        Returns the gate definition appended.
+        """
         txt = txt.strip()
         gate_decl = QTRegEx.GATE_DECL.match(txt)
         gate_name = gate_decl.group(1)
@@ -805,7 +1711,11 @@ class QasmTranslator():
             gate_ops_list.append({'op': op,
                                   'op_param_list': op_param_list,
                                   'op_reg_list': op_reg_list})
-        gate = {'source': txt if self.save_gate_source else None,
+        if not self.save_gate_source:
+            source = None
+        else:
+            source = txt if span is None else span
+        gate = {'source': source,
                 'filenum': filenum,
                 'linenum': linenum, 'gate_name': gate_name,
                 'gate_param_list': gate_param_list,
@@ -814,150 +1724,440 @@ class QasmTranslator():
                 'gate_reg_list': gate_reg_list}
 
         self.append_user_gate(gate)
+        return gate
 
     def translate(self):
         """
         Translate the qasm source into the desired representation.
         Use get_translation() to retrieve the translated source.
+        If there is a cache_dir, a cached translation of the same source,
+        includes and options is used instead, or else the translation
+        is cached there.
+        If workers is more than 1, the program body is translated by
+        parallel_translate() unless program source is to be saved, the
+        source is a stream, or this is itself a worker process.
+        """
+        started = time.perf_counter()
+        ast_cache = None
+        if self.cache_dir:
+            source_digest = self.source_digest()
+            if source_digest:
+                ast_cache = AstCache(self.cache_dir)
+                key = ast_cache.key(source_digest, self.cache_options())
+                translation = ast_cache.load(key)
+                if translation is not None:
+                    self.use_cached_translation(translation)
+                    if self.stats:
+                        self.stats.cache_hits += 1
+                        self.stats.total_time += time.perf_counter() - started
+                    return
+        if self.workers > 1 and not self.save_pgm_source \
+                and isinstance(self.qasmsourcelines, (list, tuple, Source_File)) \
+                and not multiprocessing.current_process().daemon:  # Pool workers can't have pools
+            self.parallel_translate()
+        else:
+            for _ in self.iter_translate():
+                pass
+        if ast_cache:
+            ast_cache.save(key, self.translation)
+
+    def source_digest(self):
+        """
+        Return digest of the program source for the AstCache,
+        or None if the source is a stream which can't be reread
+        """
+        digest = None
+        if isinstance(self.qasmsourcelines, (list, tuple)):
+            digest = AstCache.digest_bytes('\n'.join(self.qasmsourcelines).encode('utf-8'))
+        elif isinstance(self.qasmsourcelines, Source_File):
+            digest = AstCache.digest_file(self.qasmsourcelines.filepath)
+        return digest
+
+    def cache_options(self):
+        """Return the options which affect the translation, for the AstCache"""
+        return (self.include_path, self.no_unknown,
+                self.save_pgm_source, self.save_element_source,
+                self.save_gate_source, self.show_gate_decls, self.compact)
+
+    def use_cached_translation(self, translation):
+        """
+        Adopt a translation loaded from the AstCache, keeping this
+        translation unit's name and main filepath and stamping the time
+        """
+        now = datetime.datetime.now().isoformat()
+        t_sect = translation['t_sect']
+        t_sect['name'] = self.get_t_sect()['name']
+        t_sect['filepaths'][0] = self.get_nth_filepath(0)
+        t_sect['datetime_start'] = now
+        t_sect['datetime_finish'] = now
+        self.t_sect.t_sect = t_sect
+        if self.compact:
+            self.c_sect = translation['c_sect']
+        else:
+            self.c_sect.c_sect = translation['c_sect']
+        self.g_sect.g_sect = translation['g_sect']
+        self.s_sect.s_sect = translation['s_sect']
+        self.translation.update(translation)
+
+    def iter_translate(self, retain=True):
+        """
+        Generator which translates the qasm source as it is read,
+        yielding each element as soon as it has been parsed as a tuple
+        ('c_sect', code_element) or ('g_sect', gate_definition).
+        retain = False if code elements are not to be kept in c_sect
+        (gate definitions are always kept in g_sect for circuit generation).
+        Use get_translation() to retrieve the translated source.
         """
         self.get_t_sect()[
             'datetime_start'] = datetime.datetime.now().isoformat()
-        seen_noncomment = False
-        parsing_gate = False
-        gate_def = ''
-        gate_start_line = None
-        gate_start_linenum = None
-        seen_open_curly = False
+        seen_noncomment = self.seen_noncomment
+        main_end_linenum = None
+        spans = self.save_element_source or self.save_gate_source
+        span = None
+        stats = self.stats
+        if stats:
+            started = time.perf_counter()
 
         while self.source_frame_stack.depth():
-            filenum, linenum, line = self.source_frame_stack.next()
-            if line is None:
+            if stats:
+                stats.start()
+            filenum, linenum, end_linenum, source = self.source_frame_stack.next_statement()
+            if source is None:
+                if stats:
+                    stats.lap('read')
+                    stats.end_source(self.source_frame_stack.tos())
                 self.source_frame_stack.pop()
+                self.end_include()
                 continue
-            astElement = None
-            line = line.strip()
-            line = line.replace(', ', ',')
+            line = source.replace(', ', ',')
             line = line.replace(' ;', ';')
-            eolComment = ASTType.ast_eol_comment(line)
-
-            if parsing_gate:
-                if not seen_open_curly:
-                    x = QTRegEx.START_CURLY.search(line)
-                    if not x:
-                        raise Qasm_Gate_Missing_Open_Curly_Exception(filenum,
-                                                                     self.get_nth_filepath(
-                                                                         filenum),
-                                                                     linenum,
-                                                                     gate_start_line,
-                                                                     gate_start_linenum)
-                    else:
-                        seen_open_curly = True
-                        gate_def = gate_def + line + ' '
-                        x = QTRegEx.END_CURLY.search(line)
-                        if x:
-                            self.user_gate_definition(
-                                gate_start_linenum, gate_def)
-                            parsing_gate = False
-                            gate_def = ''
-                            gate_start_line = None
-                            gate_start_linenum = None
-                            seen_open_curly = False
-                else:
-                    gate_def = gate_def + line + ' '
-                    x = QTRegEx.END_CURLY.search(line)
-                    if x:
-                        self.user_gate_definition(
-                            filenum, gate_start_linenum, gate_def)
-                        parsing_gate = False
-                        gate_def = ''
-                        gate_start_line = None
-                        gate_start_linenum = None
-                        seen_open_curly = False
-
-                continue
+            if stats:
+                stats.lap('read')
 
-            astElement = ASTElementUnknown(filenum, linenum, line)
-            astType = ASTType.astType(line)
+            astType, match = ASTType.astTypeMatch(line)
+            if stats:
+                stats.lap('classify')
             if astType == ASTType.BLANK:
                 continue
             if not seen_noncomment and astType != ASTType.COMMENT:
                 if astType == ASTType.DECLARATION_QASM_2_0:
-                    seen_noncomment = True
+                    seen_noncomment = self.seen_noncomment = True
                 else:
                     raise Qasm_Declaration_Absent_Exception(
                         filenum, self.get_nth_filepath(filenum), linenum, line)
-
-            # Now step thru types
-            if astType == ASTType.COMMENT:
-                astElement = ASTElementComment(
-                    filenum, linenum, line, self.save_element_source, eol_comment=eolComment)
-            elif astType == ASTType.DECLARATION_QASM_2_0:
-                astElement = ASTElementDeclarationQasm2_0(
-                    filenum, linenum, line, self.save_element_source, eol_comment=eolComment)
+            if self.stop_at_body and self.source_frame_stack.depth() == 1:
+                if astType in self.BODY_TYPES and linenum != main_end_linenum:
+                    self.source_frame_stack.tos().push_back_statement(
+                        (linenum, end_linenum, source))
+                    self.body_linenum = linenum
+                    if stats:
+                        stats.total_time += time.perf_counter() - started
+                    return
+                main_end_linenum = end_linenum
+            if spans:
+                span = self.source_frame_stack.tos().source_span(linenum, end_linenum)
+
+            if stats:
+                stats.statements += 1
+
+            # Now step thru types, most frequent first
+            spliced = None
             if astType == ASTType.INCLUDE:
                 astElement = ASTElementInclude(
-                    filenum, linenum, line, self.save_element_source, eol_comment=eolComment)
-                self.push_include(astElement.out()['include'])
-            elif astType == ASTType.CTL_2:
-                astElement = ASTElementCtl2(
-                    filenum, linenum, line, self.save_element_source, eol_comment=eolComment)
-            elif astType == ASTType.QREG:
-                astElement = ASTElementQReg(
-                    filenum, linenum, line, self.save_element_source, eol_comment=eolComment)
-            elif astType == ASTType.CREG:
-                astElement = ASTElementCReg(
-                    filenum, linenum, line, self.save_element_source, eol_comment=eolComment)
-            elif astType == ASTType.MEASURE:
-                astElement = ASTElementMeasure(
-                    filenum, linenum, line, self.save_element_source, eol_comment=eolComment)
-            elif astType == ASTType.BARRIER:
-                astElement = ASTElementBarrier(
-                    filenum, linenum, line, self.save_element_source, eol_comment=eolComment)
+                    filenum, linenum, line, self.save_element_source,
+                    eol_comment=ASTType.ast_eol_comment(line), match=match)
+                if span is not None:
+                    astElement.source = span
+                spliced = self.push_include(astElement.include)
+                if stats:
+                    stats.includes += 1
+                    stats.lap('include')
 
             elif astType == ASTType.GATE:
                 if self.show_gate_decls:
                     astElement = ASTElementGateDefinitionPlaceholder(
-                        filenum, linenum, line, self.save_element_source, eol_comment=eolComment)
-                    self.append_ast(astElement.out())
-                parsing_gate = True
-                gate_start_line = line
-                gate_start_linenum = linenum
-                gate_def = line + ' '
-                x = QTRegEx.START_CURLY.search(line)
-                if x:
-                    seen_open_curly = True
-                    x = QTRegEx.END_CURLY.search(line)
-                    if x:
-                        self.user_gate_definition(
-                            filenum, gate_start_linenum, gate_def)
-                        parsing_gate = False
-                        gate_def = ''
-                        gate_start_line = None
-                        gate_start_linenum = None
-                        seen_open_curly = False
+                        filenum, linenum, line, self.save_element_source,
+                        eol_comment=ASTType.ast_eol_comment(line))
+                    ast = astElement.out()
+                    if retain:
+                        self.append_ast(ast)
+                    self.record_include('c_sect', ast)
+                    if stats:
+                        stats.elements[astType] += 1
+                    yield 'c_sect', ast
+                    if stats:
+                        stats.start()
+                gate = self.gate_definition(filenum, linenum, end_linenum, line, span)
+                self.record_include('g_sect', gate)
+                if stats:
+                    stats.gates += 1
+                    stats.lap('gate')
+                yield 'g_sect', gate
                 continue
 
-            elif astType == ASTType.OP:
-                astElement = ASTElementOp(
-                    filenum, linenum, line, self.save_element_source, eol_comment=eolComment)
-            if type(astElement) is ASTElementUnknown and self.no_unknown:
+            else:
+                astElement = self.statement_element(astType, match, filenum, linenum, line,
+                                                    span)
+            ast = astElement.out()
+            if stats:
+                stats.elements[astType] += 1
+                stats.lap('element')
+            if retain:
+                self.append_ast(ast)
+            self.record_include('c_sect', ast)
+            yield 'c_sect', ast
+            if spliced is not None:
+                yield from self.splice_include(spliced, retain)
+
+        if stats:
+            stats.total_time += time.perf_counter() - started
+        self.t_sect.t_sect['datetime_finish'] = datetime.datetime.now(
+        ).isoformat()
+
+    # Statement types found in the body of a program following its header
+    BODY_TYPES = (ASTType.OP, ASTType.MEASURE, ASTType.BARRIER, ASTType.CTL_2)
+
+    def statement_element(self, astType, match, filenum, linenum, line, span=None):  # pylint: disable-msg=too-many-arguments
+        """
+        Return AST element of a statement which is neither include nor gate definition
+        astType, match = statement type and match from ASTType.astTypeMatch()
+        span = Source_Span, or in a worker its tuple, kept as element source
+            instead of line, or None
+        """
+        eolComment = ASTType.ast_eol_comment(line)
+        if astType == ASTType.OP:
+            astElement = ASTElementOp(
+                filenum, linenum, line, self.save_element_source, eol_comment=eolComment,
+                match=match)
+        elif astType == ASTType.MEASURE:
+            astElement = ASTElementMeasure(
+                filenum, linenum, line, self.save_element_source, eol_comment=eolComment,
+                match=match)
+        elif astType == ASTType.BARRIER:
+            astElement = ASTElementBarrier(
+                filenum, linenum, line, self.save_element_source, eol_comment=eolComment,
+                match=match)
+        elif astType == ASTType.COMMENT:
+            astElement = ASTElementComment(
+                filenum, linenum, line, self.save_element_source, eol_comment=eolComment)
+        elif astType == ASTType.CTL_2:
+            astElement = ASTElementCtl2(
+                filenum, linenum, line, self.save_element_source, eol_comment=eolComment,
+                match=match)
+        elif astType == ASTType.QREG:
+            astElement = ASTElementQReg(
+                filenum, linenum, line, self.save_element_source, eol_comment=eolComment,
+                match=match)
+        elif astType == ASTType.CREG:
+            astElement = ASTElementCReg(
+                filenum, linenum, line, self.save_element_source, eol_comment=eolComment,
+                match=match)
+        elif astType == ASTType.DECLARATION_QASM_2_0:
+            astElement = ASTElementDeclarationQasm2_0(
+                filenum, linenum, line, self.save_element_source, eol_comment=eolComment)
+        else:
+            if self.no_unknown:
                 raise Qasm_Unknown_Element_Exception(filenum,
                                                      self.get_nth_filepath(
                                                          filenum),
                                                      linenum,
                                                      line)
-            self.append_ast(astElement.out())
+            astElement = ASTElementUnknown(filenum, linenum, line)
+        if span is not None:
+            astElement.source = span
+        return astElement
+
+    def gate_definition(self, filenum, linenum, end_linenum, line, span=None):  # pylint: disable-msg=too-many-arguments
+        """
+        Check and parse a gate definition statement from linenum to end_linenum
+        span = Source_Span, or in a worker its tuple, kept as gate source
+            instead of line, or None
+        Returns the gate definition appended to g_sect.
+        """
+        if '{' not in line:
+            raise Qasm_Gate_Missing_Open_Curly_Exception(filenum,
+                                                         self.get_nth_filepath(
+                                                             filenum),
+                                                         end_linenum,
+                                                         line,
+                                                         linenum)
+        if '}' not in line:
+            raise Qasm_Incomplete_Gate_Exception(filenum,
+                                                 self.get_nth_filepath(
+                                                     filenum),
+                                                 end_linenum,
+                                                 line,
+                                                 linenum)
+        return self.user_gate_definition(filenum, linenum, line, span)
+
+    # Size of the pieces into which parallel_translate() divides a body
+    PARALLEL_CHUNK_LINES = 50000
+    PARALLEL_CHUNK_BYTES = 2 ** 21
+
+    def parallel_translate(self):
+        """
+        Translate the header of the program (everything up to the first
+        op, measure, barrier or if, including all include files) in this
+        process, then divide the rest of the main source into chunks
+        translated by worker processes and appended here in order.
+        If a chunk can't be translated apart from the rest, e.g., it has
+        an include or a statement runs over its end, the body is instead
+        translated in this process.
+        """
+        datetime_start = datetime.datetime.now().isoformat()
+        self.stop_at_body = True
+        try:
+            for _ in self.iter_translate():
+                pass
+        finally:
+            self.stop_at_body = False
+        if self.body_linenum is not None:
+            started = time.perf_counter()
+            chunks = self.body_chunks(self.body_linenum)
+            translated = len(chunks) > 1 and self.translate_chunks(chunks)
+            if self.stats:
+                self.stats.total_time += time.perf_counter() - started
+            if translated:
+                if self.stats:  # Workers counted the lines of the body
+                    self.stats.end_source(self.source_frame_stack.tos())
+                    self.stats.lines -= self.source_frame_stack.tos().linenum - self.body_linenum
+                self.source_frame_stack.pop()
+            for _ in self.iter_translate():
+                pass
+        self.get_t_sect()['datetime_start'] = datetime_start
 
-        if parsing_gate:
-            raise Qasm_Incomplete_Gate_Exception(
-                filenum,
-                self.get_nth_filepath(filenum),
-                linenum,
-                gate_start_line,
-                gate_start_linenum)
+    def body_chunks(self, body_linenum):
+        """
+        Divide main source from body_linenum into chunks
+        Returns list of (first linenum, lines or byte range in source file)
+        """
+        chunks = []
+        if isinstance(self.qasmsourcelines, Source_File):
+            with open(self.qasmsourcelines.filepath, 'rb') as file_handle:
+                with mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                    start = 0
+                    for _ in range(body_linenum):
+                        start = source.find(b'\n', start) + 1
+                    linenum = body_linenum
+                    while 0 < start < len(source):
+                        end = source.find(b'\n', start + self.PARALLEL_CHUNK_BYTES)
+                        end = len(source) if end < 0 else end + 1
+                        chunks.append((linenum, (start, end)))
+                        linenum += source[start:end].count(b'\n')
+                        start = end
+        else:
+            for linenum in range(body_linenum, len(self.qasmsourcelines),
+                                 self.PARALLEL_CHUNK_LINES):
+                chunks.append((linenum, self.qasmsourcelines[
+                    linenum:linenum + self.PARALLEL_CHUNK_LINES]))
+        return chunks
 
-        self.t_sect.t_sect['datetime_finish'] = datetime.datetime.now(
-        ).isoformat()
+    def translate_chunks(self, chunks):
+        """
+        Translate chunks of main source in worker processes, appending
+        their c_sect and g_sect here.
+        Returns False if some chunk could not be translated apart from
+        the rest, in which case nothing is appended.
+        Raises the Qasm_Exception of the first chunk in error.
+        """
+        options = {'no_unknown': self.no_unknown,
+                   'save_element_source': self.save_element_source,
+                   'save_gate_source': self.save_gate_source,
+                   'show_gate_decls': self.show_gate_decls,
+                   'stats': self.stats is not None}
+        filepath = self.get_nth_filepath(0)
+        jobs = [(options, filepath, linenum, source) for linenum, source in chunks]
+        with multiprocessing.Pool(min(self.workers, len(jobs))) as pool:
+            results = pool.map(_translate_chunk, jobs, 1)
+        for result in results:
+            if isinstance(result, Qasm_Exception):
+                raise result
+            if result is None:
+                return False
+        source_buffer = self.source_frame_stack.tos().source_buffer
+        for c_sect, g_sect, stats in results:
+            if stats:
+                self.stats.merge(stats)
+            if source_buffer is not None:  # Workers kept source as span tuples
+                for entry in itertools.chain(c_sect, g_sect):
+                    if isinstance(entry.get('source'), tuple):
+                        entry['source'] = Source_Span(source_buffer, *entry['source'])
+            if self.compact:
+                for ast in c_sect:
+                    self.append_ast(ast)
+            else:
+                self.get_c_sect().extend(c_sect)
+            self.get_g_sect().extend(g_sect)
+        return True
+
+    def translate_chunk(self, linenum, lines):
+        """
+        Translate lines of the main source starting at linenum into
+        c_sect and g_sect, for a worker process of parallel_translate().
+        Source kept is a tuple (linenum, column, end_linenum), from which
+        parallel_translate() makes the Source_Span.
+        Returns False if lines can't be translated apart from the rest
+        of the source because of an include or an unfinished statement.
+        """
+        lexer = Statement_Lexer()
+        stats = self.stats
+        columns = [] if self.save_element_source or self.save_gate_source else None
+        span = None
+        for line in lines:
+            if stats:
+                stats.start()
+                stats.lines += 1
+            line = line.strip()
+            if line:
+                statements = lexer.lex(linenum, line, columns)
+                if stats:
+                    stats.lap('read')
+                for n, (start_linenum, end_linenum, source) in enumerate(statements):
+                    if columns is not None:
+                        span = (start_linenum, columns[n], end_linenum)
+                    if self.translate_statement(0, start_linenum, end_linenum,
+                                                source, span) == ASTType.INCLUDE:
+                        return False
+                if columns is not None:
+                    del columns[:]
+            linenum += 1
+        return lexer.flush() is None
+
+    def translate_statement(self, filenum, linenum, end_linenum, source, span=None):  # pylint: disable-msg=too-many-arguments
+        """
+        Translate a statement from linenum to end_linenum which is not
+        part of the header, appending to c_sect and g_sect.
+        span = kept as source instead of the statement text, or None
+        Returns its ASTType. An include is not translated.
+        """
+        stats = self.stats
+        if stats:
+            stats.start()
+        line = source.replace(', ', ',')
+        line = line.replace(' ;', ';')
+        astType, match = ASTType.astTypeMatch(line)
+        if stats:
+            stats.lap('classify')
+            if astType != ASTType.BLANK:
+                stats.statements += 1
+        if astType == ASTType.GATE:
+            if self.show_gate_decls:
+                self.append_ast(ASTElementGateDefinitionPlaceholder(
+                    filenum, linenum, line, self.save_element_source,
+                    eol_comment=ASTType.ast_eol_comment(line)).out())
+                if stats:
+                    stats.elements[astType] += 1
+            self.gate_definition(filenum, linenum, end_linenum, line, span)
+            if stats:
+                stats.gates += 1
+                stats.lap('gate')
+        elif astType not in (ASTType.BLANK, ASTType.INCLUDE):
+            self.append_ast(self.statement_element(
+                astType, match, filenum, linenum, line, span).out())
+            if stats:
+                stats.elements[astType] += 1
+                stats.lap('element')
+        return astType
 
     def get_translation(self):
         """Retrieve translation created by translate()"""
@@ -1032,6 +2232,29 @@ class QasmTranslator():
         return self.get_g_sect()[index]
 
 
+def _translate_chunk(job):
+    """
+    Worker process translation of a chunk of main source for
+    QasmTranslator.parallel_translate()
+    job = (translator options, filepath, first linenum, lines or byte range)
+    Returns (c_sect, g_sect, Translation_Stats or None), None if chunk
+    can't be translated alone, or the Qasm_Exception raised
+    """
+    options, filepath, linenum, source = job
+    if isinstance(source, tuple):
+        start, end = source
+        with open(filepath, 'rb') as file_handle:
+            file_handle.seek(start)
+            source = io.TextIOWrapper(io.BytesIO(file_handle.read(end - start)))
+    qt = QasmTranslator([], filepath=filepath, include_cache=False, **options)  # pylint: disable-msg=invalid-name
+    try:
+        if not qt.translate_chunk(linenum, source):
+            return None
+    except Qasm_Exception as ex:
+        return ex
+    return qt.get_c_sect(), qt.get_g_sect(), qt.stats
+
+
 # ##########
 # Exceptions
 # ##########
@@ -1049,6 +2272,10 @@ class Qasm_Exception(Exception):
         self.message = "Qasm_Exception"
         self.errcode = 10
 
+    def __reduce__(self):
+        """Pickle by attributes, e.g., to pass between processes"""
+        return copyreg.__newobj__, (type(self),), self.__dict__
+
     def errpacket(self):
         ex = {'message': self.message,
               'filenum': self.filenum,
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+qasmexpr.py
+Parse and evaluate OPENQASM 2.0 parameter expressions without eval()
+Copyright 2019 Jack Woehr jwoehr@softwoehr.com PO Box 51, Golden, CO 80402-0051.
+Apache-2.0 license -- See LICENSE which you should have received with this code.
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+WITHOUT ANY EXPRESS OR IMPLIED WARRANTIES.
+"""
+from functools import lru_cache
+import math
+import operator
+import re
+
+# exp: real | nninteger | pi | id | exp + exp | exp - exp | exp * exp
+#      | exp / exp | -exp | exp ^ exp | (exp) | unaryop(exp)
+# unaryop: sin | cos | tan | exp | ln | sqrt
+# ^ binds tightest and to the right, then unary minus, then * /, then + -
+FUNCTIONS = {'sin': math.sin, 'cos': math.cos, 'tan': math.tan,
+             'exp': math.exp, 'ln': math.log, 'sqrt': math.sqrt}
+
+_BINARY = {'+': operator.add, '-': operator.sub, '*': operator.mul,
+           '/': operator.truediv, '^': operator.pow}
+
+_TOKEN = re.compile(r"\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)"
+                    r"|([A-Za-z_]\w*)|([-+*/^()]))")
+
+# Compiled expressions kept, by source text
+CACHE_SIZE = 65536
+
+
+class ExpressionException(ValueError):
+    """Parameter expression which can't be parsed or evaluated"""
+
+    def __init__(self, message, text):
+        super(ExpressionException, self).__init__(message + ': ' + repr(text))
+        self.message = message
+        self.text = text
+        self.errcode = 310
+
+    def __reduce__(self):
+        """Pickle by constructor arguments, e.g., to pass between processes"""
+        return type(self), (self.message, self.text)
+
+    def errpacket(self):
+        "Get the error packet from exception as dict"
+        return {'message': self.message,
+                'text': self.text,
+                'errcode': self.errcode}
+
+
+class Expression():
+    """
+    Compiled parameter expression.
+    value is its float value if it has no identifiers, else None.
+    names is the set of identifiers it has, e.g., gate parameters.
+    """
+
+    __slots__ = ('text', 'value', 'names', 'function')
+
+    def __init__(self, text, compiled, names):
+        """
+        text ... source of expression
+        compiled ... float, or function of dict of identifier values
+        names ... set of identifiers in expression
+        """
+        self.text = text
+        self.names = frozenset(names)
+        if callable(compiled):
+            self.value = None
+            self.function = compiled
+        else:
+            self.value = compiled
+            self.function = None
+
+    def evaluate(self, bindings=None):
+        """
+        Return float value of expression with identifiers given by
+        dict bindings of identifier to float.
+        Raises ExpressionException if an identifier is unbound or the
+        math fails, e.g., division by zero.
+        """
+        if self.function is None:
+            return self.value
+        try:
+            return self.function(bindings or {})
+        except KeyError as ex:
+            raise ExpressionException('Unbound identifier ' + str(ex), self.text)
+        except (ArithmeticError, ValueError, TypeError) as ex:
+            raise ExpressionException(str(ex), self.text)
+
+    def __reduce__(self):
+        """Pickle as source text, compiled again when unpickled"""
+        return compile_expression, (self.text,)
+
+    def __repr__(self):
+        return 'Expression(' + repr(self.text) + ')'
+
+
+class _Parser():
+    """Recursive descent parser compiling an expression to nested functions"""
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = self.tokenize(text)
+        self.pos = 0
+        self.names = set()
+
+    @staticmethod
+    def tokenize(text):
+        """Return list of (kind, token), kind being 'number', 'name' or 'op'"""
+        tokens = []
+        pos = 0
+        end = len(text.rstrip())
+        while pos < end:
+            match = _TOKEN.match(text, pos)
+            if not match:
+                raise ExpressionException('Bad character in expression', text)
+            number, name, op = match.groups()  # pylint: disable-msg=invalid-name
+            if number is not None:
+                tokens.append(('number', float(number)))
+            elif name is not None:
+                tokens.append(('name', name))
+            else:
+                tokens.append(('op', op))
+            pos = match.end()
+        return tokens
+
+    def peek(self):
+        """Return next token or (None, None) at end"""
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def expect(self, token):
+        """Consume the operator token or raise"""
+        if self.peek() != ('op', token):
+            raise ExpressionException("Expected '" + token + "'", self.text)
+        self.pos += 1
+
+    def parse(self):
+        """Return compiled expression, a float or a function of bindings"""
+        if not self.tokens:
+            raise ExpressionException('Empty expression', self.text)
+        compiled = self.additive()
+        if self.pos < len(self.tokens):
+            raise ExpressionException('Unexpected ' + repr(self.tokens[self.pos][1]), self.text)
+        return compiled
+
+    def binary(self, op, left, right):  # pylint: disable-msg=invalid-name
+        """Combine two compiled operands, folding constants"""
+        function = _BINARY[op]
+        left_const = not callable(left)
+        right_const = not callable(right)
+        if left_const and right_const:
+            try:
+                return float(function(left, right))
+            except (ArithmeticError, ValueError, TypeError) as ex:
+                raise ExpressionException(str(ex), self.text)
+        if left_const:
+            return lambda bindings: function(left, right(bindings))
+        if right_const:
+            return lambda bindings: function(left(bindings), right)
+        return lambda bindings: function(left(bindings), right(bindings))
+
+    def additive(self):
+        """exp: term (('+' | '-') term)*"""
+        compiled = self.multiplicative()
+        while self.peek() in (('op', '+'), ('op', '-')):
+            op = self.tokens[self.pos][1]  # pylint: disable-msg=invalid-name
+            self.pos += 1
+            compiled = self.binary(op, compiled, self.multiplicative())
+        return compiled
+
+    def multiplicative(self):
+        """term: unary (('*' | '/') unary)*"""
+        compiled = self.unary()
+        while self.peek() in (('op', '*'), ('op', '/')):
+            op = self.tokens[self.pos][1]  # pylint: disable-msg=invalid-name
+            self.pos += 1
+            compiled = self.binary(op, compiled, self.unary())
+        return compiled
+
+    def unary(self):
+        """unary: ('-' | '+') unary | power"""
+        kind, token = self.peek()
+        if kind == 'op' and token in '+-':
+            self.pos += 1
+            compiled = self.unary()
+            if token == '+':
+                return compiled
+            if callable(compiled):
+                return lambda bindings: -compiled(bindings)
+            return -compiled
+        return self.power()
+
+    def power(self):
+        """power: primary ('^' unary)?"""
+        compiled = self.primary()
+        if self.peek() == ('op', '^'):
+            self.pos += 1
+            compiled = self.binary('^', compiled, self.unary())
+        return compiled
+
+    def primary(self):
+        """primary: number | pi | id | unaryop '(' exp ')' | '(' exp ')'"""
+        kind, token = self.peek()
+        self.pos += 1
+        if kind == 'number':
+            return token
+        if kind == 'name':
+            if token == 'pi':
+                return math.pi
+            function = FUNCTIONS.get(token)
+            if function is not None and self.peek() == ('op', '('):
+                self.pos += 1
+                argument = self.additive()
+                self.expect(')')
+                if callable(argument):
+                    return lambda bindings: function(argument(bindings))
+                try:
+                    return float(function(argument))
+                except (ArithmeticError, ValueError, TypeError) as ex:
+                    raise ExpressionException(str(ex), self.text)
+            self.names.add(token)
+            return lambda bindings: bindings[token]
+        if (kind, token) == ('op', '('):
+            compiled = self.additive()
+            self.expect(')')
+            return compiled
+        raise ExpressionException('Unexpected ' + ('end' if kind is None else repr(token)),
+                                  self.text)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_expression(text):
+    """
+    Return the Expression compiled from source text, compiled once
+    and cached thereafter.
+    Raises ExpressionException if text is not an expression.
+    """
+    parser = _Parser(text)
+    try:
+        compiled = parser.parse()
+    except RecursionError:
+        raise ExpressionException('Expression nested too deeply', text)
+    return Expression(text, compiled, parser.names)
+
+
+def evaluate_expression(text, bindings=None):
+    """
+    Return float value of expression source text with identifiers
+    given by dict bindings. See Expression.evaluate().
+    """
+    return compile_expression(text).evaluate(bindings)
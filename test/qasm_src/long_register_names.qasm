@@ -0,0 +1,13 @@
+// Register names longer than one character
+OPENQASM 2.0;
+include "qelib1.inc";
+qreg qr[2];
+qreg anc[1];
+creg cr[2];
+creg flag[1];
+h qr[0];
+cx qr[0], qr[1];
+cx qr[1], anc[0];
+barrier qr, anc;
+measure qr -> cr;
+measure anc[0] -> flag[0];
@@ -0,0 +1,11 @@
+OPENQASM 2.0;
+include "qelib1.inc";
+qreg q[3]; creg c[3];
+h q[0]; // start
+cx q[0],
+   q[1];
+u3(0.1,
+   0.2, // angles
+   0.3) q[2];
+measure q
+   -> c;
@@ -5,8 +5,13 @@ Created on Fri Feb 21 19:03:20 2020
 
 @author: jax
 """
+import math
 import os
+import pickle
 import unittest
+from qiskit import ClassicalRegister
+from qiskit.circuit.exceptions import CircuitError
+from qiskit.quantum_info import Operator
 import nuqasm2 as nq
 
 
@@ -29,3 +34,266 @@ class TestCircuitGeneration(unittest.TestCase):
     def test_unknown_op(self):
         """Test unknown op that can't be unrolled."""
         self._test_circ_qasm_file_raises("unknown_op", nq.Ast2CircOpNotFoundException)
+
+    def test_load_many(self):
+        """Test batch load in worker processes, errors returned per item."""
+        filenames = ['test/qasm_src/' + name + '.qasm'
+                     for name in ('local_gate_include', 'unknown_op', 'minified', 'no_such_file')]
+        results = nq.load_many(filenames=filenames, include_path=self.include_path, workers=2)
+        self.assertEqual(results[0].qasm(),
+                         nq.load_from_file(filenames[0], include_path=self.include_path).qasm())
+        self.assertEqual(results[1]['errcode'], nq.Ast2CircOpNotFoundException().errcode)
+        self.assertEqual(results[2].qasm(),
+                         nq.load_from_file(filenames[2], include_path=self.include_path).qasm())
+        self.assertEqual(results[3]['errcode'], 55)
+        unordered = dict(nq.load_many(filenames=filenames, include_path=self.include_path,
+                                      workers=2, ordered=False))
+        self.assertEqual(sorted(unordered), [0, 1, 2, 3])
+        self.assertEqual(unordered[2].qasm(), results[2].qasm())
+
+    def test_load_many_bad_expression(self):
+        """Test batch load returns errpacket of bad parameter expression from worker."""
+        data = [['OPENQASM 2.0;', 'qreg q[1];', 'rz(foo) q[0];'],
+                ['OPENQASM 2.0;', 'qreg q[1];', 'rz(pi/2) q[0];']]
+        results = nq.load_many(data=data, include_path=self.include_path, workers=2)
+        self.assertEqual(results[0]['errcode'], 220)
+        self.assertIsInstance(results[0]['prev_ex'], nq.ExpressionException)
+        self.assertEqual(results[0]['prev_ex'].text, 'foo')
+        self.assertEqual(results[1].qasm(),
+                         nq.load_from_string(data[1], include_path=self.include_path).qasm())
+
+    def test_load_many_mixed(self):
+        """Test batch load with qiskit rejecting one program, in process and in workers."""
+        data = [['OPENQASM 2.0;', 'qreg q[2];', 'h q[0];'],
+                ['OPENQASM 2.0;', 'qreg q[2];', 'cx q[0],q[0];'],
+                ['OPENQASM 2.0;', 'qreg q[2];', 'cx q[0],q[1];']]
+        for workers in (1, 2):
+            results = nq.load_many(data=data, include_path=self.include_path, workers=workers)
+            self.assertEqual(results[0].qasm(),
+                             nq.load_from_string(data[0], include_path=self.include_path).qasm())
+            self.assertEqual(results[1]['errcode'], 220)
+            self.assertIsInstance(results[1]['prev_ex'], CircuitError)
+            self.assertEqual(results[2].qasm(),
+                             nq.load_from_string(data[2], include_path=self.include_path).qasm())
+
+    def test_operand_resolution(self):
+        """Test operands resolve to the bits and registers they name."""
+        circ = nq.load_from_string(['OPENQASM 2.0;', 'qreg q[300];', 'qreg r[2];', 'creg c[2];',
+                                    'cx q[299],r[1];', 'h r;', 'barrier q[7],r;',
+                                    'measure r[0] -> c[1];', 'measure r -> c;'],
+                                   include_path=self.include_path)
+        qubits = circ.qregs[0]
+        rqubits = circ.qregs[1]
+        clbits = circ.cregs[0]
+        self.assertListEqual([(instr.name, qargs, cargs) for instr, qargs, cargs in circ.data],
+                             [('cx', [qubits[299], rqubits[1]], []),
+                              ('h', [rqubits[0]], []), ('h', [rqubits[1]], []),
+                              ('barrier', [qubits[7], rqubits[0], rqubits[1]], []),
+                              ('measure', [rqubits[0]], [clbits[1]]),
+                              ('measure', [rqubits[0]], [clbits[0]]),
+                              ('measure', [rqubits[1]], [clbits[1]])])
+
+    def test_gate_parameter_names(self):
+        """Test gate parameters whose names contain one another or 'pi'."""
+        circ = nq.load_from_string(['OPENQASM 2.0;', 'qreg q[1];',
+                                    'gate g(a, ab, pia) x { rz(ab-a) x; rx(pia*2) x; }',
+                                    'g(1, 3, pi/4) q[0];'],
+                                   include_path=self.include_path)
+        self.assertListEqual([(instr.name, [float(param) for param in instr.params])
+                              for instr, _, _ in circ.data],
+                             [('rz', [2.0]), ('rx', [math.pi / 2])])
+
+    def test_gate_templates(self):
+        """Test nested gate definitions compiled once into flat templates."""
+        qt = nq.qasmast.QasmTranslator(['OPENQASM 2.0;', 'qreg q[2];',  #pylint: disable-msg=invalid-name
+                                        'gate g1(t) a { rz(t/2) a; }',
+                                        'gate g2(t, tt) a, b { g1(tt) b; g1(t) a; cx a, b; }',
+                                        'g2(1, 2) q[0], q[1];', 'g2(pi, 0) q[1], q[0];'],
+                                       include_path=self.include_path)
+        qt.translate()
+        ast2circ = nq.Ast2Circ(nuq2_ast=qt.get_translation()).translate()
+        self.assertListEqual([(instr.name, [float(param) for param in instr.params],
+                               [qubit.index for qubit in qargs])
+                              for instr, qargs, _ in ast2circ.circuit.data],
+                             [('rz', [1.0], [1]), ('rz', [0.5], [0]), ('cx', [], [0, 1]),
+                              ('rz', [0.0], [0]), ('rz', [math.pi / 2], [1]),
+                              ('cx', [], [1, 0])])
+        template = ast2circ.templates['g2/2']
+        self.assertEqual(len(template.instructions), 3)
+        self.assertEqual(template.depth, 2)
+        self.assertListEqual(template.gates['g1/1'], [2, 2, 1])
+
+    def test_op_dispatch(self):
+        """Test ops named like QuantumCircuit methods aren't called as such."""
+        circ = nq.load_from_string(['OPENQASM 2.0;', 'qreg q[2];',
+                                    'gate draw a { h a; }', 'draw q[0];', 'h q[1];'],
+                                   include_path=self.include_path)
+        self.assertListEqual([instr.name for instr, _, _ in circ.data], ['h', 'h'])
+        with self.assertRaises(nq.Ast2CircOpNotFoundException):
+            nq.load_from_string(['OPENQASM 2.0;', 'qreg q[2];', 'size q[0];'],
+                                include_path=self.include_path)
+
+    def test_gates_not_shared(self):
+        """Test conditioning one op's gate leaves other ops and circuits alone."""
+        qt = nq.qasmast.QasmTranslator(['OPENQASM 2.0;', 'include "qelib1.inc";',  #pylint: disable-msg=invalid-name
+                                        'qreg q[2];', 'gate g a { h a; }',
+                                        'h q[0];', 'h q[1];', 'g q[0];'],
+                                       include_path=self.include_path)
+        qt.translate()
+        for bulk in (False, True):
+            circ = nq.Ast2Circ(nuq2_ast=qt.get_translation(), bulk=bulk).translate().circuit
+            other = nq.Ast2Circ(nuq2_ast=qt.get_translation(), bulk=bulk).translate().circuit
+            circ.data[0][0].c_if(ClassicalRegister(1, 'c'), 1)
+            self.assertIsNone(circ.data[1][0].condition)
+            self.assertIsNone(circ.data[2][0].condition)
+            self.assertIsNone(other.data[0][0].condition)
+            self.assertNotIn('if', other.qasm())
+
+    def test_bulk_circuit(self):
+        """Test circuit generated in bulk mode same as one op at a time."""
+        qt = nq.qasmast.QasmTranslator(['OPENQASM 2.0;', 'include "qelib1.inc";',  #pylint: disable-msg=invalid-name
+                                        'qreg q[2];', 'qreg r[2];', 'creg c[2];',
+                                        'gate g(t) a, b { cu1(t) a, b; barrier a, b; }',
+                                        'h q;', 'cx q[0], r;', 'g(pi/3) q[0], q[1];',
+                                        'g(pi) q, r;', 'barrier q, r[1];', 'measure q -> c;',
+                                        'measure r[0] -> c[1];'],
+                                       include_path=self.include_path)
+        qt.translate()
+        circ = nq.Ast2Circ(nuq2_ast=qt.get_translation()).translate().circuit
+        ast2circ = nq.Ast2Circ(nuq2_ast=qt.get_translation(), bulk=True).translate()
+        self.assertEqual(ast2circ.circuit, circ)
+        self.assertEqual(ast2circ.circuit.qasm(), circ.qasm())
+        self.assertIsNone(ast2circ.bulk_data)
+        qt = nq.qasmast.QasmTranslator(['OPENQASM 2.0;', 'qreg q[2];', 'cx q[0], q[0];'],  #pylint: disable-msg=invalid-name
+                                       include_path=self.include_path)
+        qt.translate()
+        with self.assertRaises(nq.Ast2CircException) as context:
+            nq.Ast2Circ(nuq2_ast=qt.get_translation(), bulk=True).translate()
+        self.assertIsInstance(context.exception.prev_ex, CircuitError)
+
+    def test_op_not_found(self):
+        """Test an op is found iff it adds instructions, barriers too."""
+        for bulk in (False, True):
+            qt = nq.qasmast.QasmTranslator(['OPENQASM 2.0;', 'qreg q[2];',  #pylint: disable-msg=invalid-name
+                                            'gate fence a, b { barrier a, b; }', 'gate nop a { }',
+                                            'fence q[0], q[1];', 'nop q[0];'],
+                                           include_path=self.include_path)
+            qt.translate()
+            ast2circ = nq.Ast2Circ(nuq2_ast=qt.get_translation(), bulk=bulk)
+            with self.assertRaises(nq.Ast2CircOpNotFoundException) as context:
+                ast2circ.translate()
+            self.assertEqual(context.exception.entry['op'], 'nop')
+            self.assertEqual([instr.name for instr, _, _ in ast2circ.circuit.data], ['barrier'])
+
+    def test_composite_gates(self):
+        """Test gate definitions kept as composite gates, not unrolled."""
+        qt = nq.qasmast.QasmTranslator(['OPENQASM 2.0;', 'include "qelib1.inc";',  #pylint: disable-msg=invalid-name
+                                        'qreg q[2];', 'qreg r[2];',
+                                        'gate g1(t) a { rz(t/2) a; }',
+                                        'gate g2(t, tt) a, b { g1(tt) b; g1(t) a; cx a, b; }',
+                                        'g2(1, 2) q[0], q[1];', 'g2(1, 2) q[1], r[0];',
+                                        'g2(pi, 0) q, r;', 'cu1(pi/3) q[0], r[1];'],
+                                       include_path=self.include_path)
+        qt.translate()
+        unrolled = nq.Ast2Circ(nuq2_ast=qt.get_translation()).translate().circuit
+        ast2circ = nq.Ast2Circ(nuq2_ast=qt.get_translation(), unroll=False, analytics=True)
+        circ = ast2circ.translate().circuit
+        self.assertListEqual([instr.name for instr, _, _ in circ.data],
+                             ['g2', 'g2', 'g2', 'g2', 'cu1'])
+        self.assertEqual(circ.data[0][0], circ.data[1][0])
+        self.assertNotEqual(circ.data[0][0], circ.data[2][0])
+        self.assertEqual([instr.name for instr, _, _ in circ.data[0][0].definition],
+                         ['g1', 'g1', 'cx'])
+        self.assertTrue(Operator(circ).equiv(Operator(unrolled)))
+        report = ast2circ.analytics.report()
+        self.assertEqual(report['composite'], 3)
+        self.assertEqual(report['easy'], 1)
+        self.assertEqual(report['unrolled'], 0)
+        again = nq.Ast2Circ(nuq2_ast=qt.get_translation(), unroll=False, bulk=True).translate()
+        self.assertIsNot(again.circuit.data[0][0], circ.data[0][0])
+        self.assertIsNot(circ.data[0][0], circ.data[1][0])
+        self.assertIs(again.circuit.data[0][0].definition[0][0],
+                      circ.data[0][0].definition[0][0])
+        self.assertIs(circ.data[1][0].definition[2][0], circ.data[0][0].definition[2][0])
+        self.assertIsNot(circ.data[2][0].definition[0][0], circ.data[0][0].definition[0][0])
+        circ.data[0][0].c_if(ClassicalRegister(1, 'c'), 1)
+        self.assertIsNone(circ.data[1][0].condition)
+        self.assertIsNone(again.circuit.data[0][0].condition)
+
+    def test_composite_pickle(self):
+        """Test circuit of composite gates survives pickling, e.g., to a worker process."""
+        qt = nq.qasmast.QasmTranslator(['OPENQASM 2.0;', 'include "qelib1.inc";',  #pylint: disable-msg=invalid-name
+                                        'qreg q[2];', 'gate g1(t) a { rz(t/2) a; }',
+                                        'gate g2(t, tt) a, b { g1(tt) b; g1(t*pi) a; cx a, b; }',
+                                        'g2(1, 2) q[0], q[1];', 'g2(0.5, 1) q[1], q[0];'],
+                                       include_path=self.include_path)
+        qt.translate()
+        circ = nq.Ast2Circ(nuq2_ast=qt.get_translation(), unroll=False).translate().circuit
+        unpickled = pickle.loads(pickle.dumps(circ))
+        self.assertListEqual([instr.name for instr, _, _ in unpickled.data], ['g2', 'g2'])
+        self.assertTrue(Operator(unpickled).equiv(Operator(circ)))
+        self.assertTrue(Operator(pickle.loads(pickle.dumps(circ))).equiv(Operator(circ)))
+
+    def test_composite_empty_gate(self):
+        """Test an empty gate definition is not found whether unrolled or not."""
+        qt = nq.qasmast.QasmTranslator(['OPENQASM 2.0;', 'qreg q[1];',  #pylint: disable-msg=invalid-name
+                                        'gate nop a { }', 'gate nop2 a { nop a; }',
+                                        'nop2 q[0];'])
+        qt.translate()
+        for unroll in (True, False):
+            with self.assertRaises(nq.Ast2CircOpNotFoundException):
+                nq.Ast2Circ(nuq2_ast=qt.get_translation(), unroll=unroll).translate()
+
+    def test_unroll_analytics(self):
+        """Test analytics of how far source ops expand."""
+        qt = nq.qasmast.QasmTranslator.fromFile(  #pylint: disable-msg=invalid-name
+            'test/qasm_src/gate_parameter_substitution.qasm', include_path=self.include_path)
+        qt.translate()
+        ast2circ = nq.Ast2Circ(nuq2_ast=qt.get_translation())
+        ast2circ.translate()
+        self.assertIsNone(ast2circ.analytics)
+        ast2circ = nq.Ast2Circ(nuq2_ast=qt.get_translation(), analytics=True)
+        ast2circ.translate()
+        report = ast2circ.analytics.report(top=1)
+        self.assertEqual(report['source_ops'], 5)
+        self.assertEqual(report['easy'], 4)
+        self.assertEqual(report['unrolled'], 1)
+        self.assertEqual(report['instructions'], 13)
+        self.assertEqual(report['max_depth'], 2)
+        self.assertEqual(len(report['ops']), 1)
+        self.assertEqual(report['ops'][0]['op'], 'cu1mol/1')
+        self.assertEqual(report['ops'][0]['linenum'], 9)
+        self.assertEqual(report['ops'][0]['instructions'], 9)
+        self.assertEqual(report['gates']['cu1mol/1']['max_depth'], 2)
+        self.assertEqual(report['gates']['cxmol/0']['expansions'], 2)
+        self.assertEqual(report['gates']['cxmol/0']['instructions'], 6)
+        self.assertEqual(report['gates']['cxmol/0']['max_depth'], 1)
+        self.assertEqual(len(ast2circ.analytics.report(top=None)['ops']), 5)
+
+    def test_circuit_memory(self):
+        """Test memory profile of circuit generation."""
+        qt = nq.qasmast.QasmTranslator.fromFile(  #pylint: disable-msg=invalid-name
+            'test/qasm_src/gate_parameter_substitution.qasm', include_path=self.include_path)
+        qt.translate()
+        report = nq.profile_circuit(nq.Ast2Circ(nuq2_ast=qt.get_translation()))
+        self.assertEqual(report['instructions'], 16)
+        self.assertGreater(report['retained'], 0)
+        self.assertGreaterEqual(report['peak'], report['retained'])
+
+    def test_incremental_circuit(self):
+        """Test circuit of incremental translation patched when ops are appended."""
+        with open('test/qasm_src/split_statements.qasm') as qasm_file:
+            lines = qasm_file.read().split('\n')
+        session = nq.IncrementalTranslator(include_path=self.include_path)
+        session.update(lines)
+        circ = session.get_circuit()
+        lines += ['x q[1];', 'cx q[1], q[2];']
+        session.update(lines)
+        self.assertIs(session.get_circuit(), circ)
+        self.assertEqual(circ.qasm(),
+                         nq.load_from_string(lines, include_path=self.include_path).qasm())
+        lines[3] = 'h q[1];'
+        session.update(lines)
+        self.assertIsNot(session.get_circuit(), circ)
+        self.assertEqual(session.get_circuit().qasm(),
+                         nq.load_from_string(lines, include_path=self.include_path).qasm())
@@ -6,7 +6,10 @@ Created on Fri Feb 21 19:03:20 2020
 @author: jax
 """
 import io
+import math
 import os
+import shutil
+import tempfile
 import unittest
 import nuqasm2 as nq
 
@@ -20,13 +23,14 @@ class TestParsing(unittest.TestCase):
         """Nonsense test"""
         self.assertFalse(nq.qasmast.ASTType.UNKNOWN.value)
 
-    def _test_circ_qasm_file_compare(self, regression_name):
+    def _test_circ_qasm_file_compare(self, regression_name, **translator_options):
         """Factor to run translation and do file compare"""
         self.maxDiff = None  #pylint: disable-msg=invalid-name
         from_file_path = 'test/qasm_src/' + regression_name + '.qasm'
         validation_file_path = 'test/validation_output/' + regression_name + '.output.txt'
         qt = nq.qasmast.QasmTranslator.fromFile(from_file_path,  #pylint: disable-msg=invalid-name
-                                                include_path=self.include_path)
+                                                include_path=self.include_path,
+                                                **translator_options)
         qt.translate()
         translated_ast = qt.get_translation()
         ast2circ = nq.Ast2Circ(nuq2_ast=translated_ast)
@@ -60,3 +64,287 @@ class TestParsing(unittest.TestCase):
         """Test gate parameter substitution at runtime
         by params to gate invocation."""
         self._test_circ_qasm_file_compare('gate_parameter_substitution')
+
+    def test_long_register_names(self):
+        """Test register names longer than one character."""
+        self._test_circ_qasm_file_compare('long_register_names')
+
+    def test_curly_on_next_line_gatedef(self):
+        """Test open curly brace on line following gatedef declaration."""
+        self._test_circ_qasm_file_compare('curly_on_next_line_gatedef')
+
+    def test_minified(self):
+        """Test whole program on one line."""
+        self._test_circ_qasm_file_compare('minified')
+
+    def test_split_statements(self):
+        """Test statements sharing a line or spanning lines."""
+        self._test_circ_qasm_file_compare('split_statements')
+
+    def test_statement_lexer(self):
+        """Test statement line numbers from the lexer."""
+        lexer = nq.qasmast.Statement_Lexer()
+        self.assertEqual(lexer.lex(0, 'h q[0]; x q[1]; // both'),
+                         [(0, 0, 'h q[0];'), (0, 0, 'x q[1]; // both')])
+        self.assertEqual(lexer.lex(1, 'gate g a {'), [])
+        self.assertEqual(lexer.lex(2, 'h a; // body'), [])
+        self.assertEqual(lexer.lex(3, '} cx q[0],'), [(1, 3, 'gate g a { h a; }')])
+        self.assertEqual(lexer.lex(4, 'q[1];'), [(3, 4, 'cx q[0], q[1];')])
+        self.assertEqual(lexer.lex(5, 'measure q'), [])
+        self.assertEqual(lexer.flush(), (5, 5, 'measure q'))
+
+    def test_source_buffer(self):
+        """Test saved source kept as buffer and spans reads back as text."""
+        qt = nq.qasmast.QasmTranslator(['OPENQASM 2.0;', 'qreg q[2];',  #pylint: disable-msg=invalid-name
+                                        'gate g a', '{ h a; } cx q[0],',
+                                        'q[1]; // eol', '  x q[0];  '],
+                                       save_pgm_source=True,
+                                       save_element_source=True,
+                                       save_gate_source=True)
+        qt.translate()
+        translation = qt.get_translation()
+        self.assertIsInstance(translation['s_sect'][0]['source'], nq.qasmast.Source_Buffer)
+        self.assertIsInstance(translation['c_sect'][2]['source'], nq.qasmast.Source_Span)
+        self.assertEqual(translation['s_sect'][0]['source'][5], 'x q[0];')
+        materialized = nq.materialize_source(translation)
+        self.assertEqual(materialized['s_sect'][0]['source'][3], '{ h a; } cx q[0],')
+        self.assertEqual(materialized['g_sect'][0]['source'], 'gate g a { h a; }')
+        self.assertListEqual([entry['source'] for entry in materialized['c_sect']],
+                             ['OPENQASM 2.0;', 'qreg q[2];', 'cx q[0],q[1]; // eol', 'x q[0];'])
+        loaded = nq.loads_ast(nq.dumps_ast(translation))
+        self.assertEqual(nq.materialize_source(loaded), materialized)
+
+    def test_translation_stats(self):
+        """Test translation statistics count what was translated."""
+        lines = ['OPENQASM 2.0;', 'qreg q[2];', 'gate g a', '{ h a; }',
+                 'g q[0]; cx q[0],q[1];', '// comment']
+        qt = nq.qasmast.QasmTranslator(lines)  #pylint: disable-msg=invalid-name
+        qt.translate()
+        self.assertIsNone(qt.stats)
+        qt = nq.qasmast.QasmTranslator(lines, stats=True)  #pylint: disable-msg=invalid-name
+        qt.translate()
+        stats = qt.stats.as_dict()
+        self.assertEqual(stats['lines'], 6)
+        self.assertEqual(stats['bytes'], sum(len(line) + 1 for line in lines))
+        self.assertEqual(stats['statements'], 6)
+        self.assertEqual(stats['gates'], 1)
+        self.assertDictEqual(stats['elements'], {'DECLARATION_QASM_2_0': 1, 'QREG': 1,
+                                                 'OP': 2, 'COMMENT': 1})
+        self.assertListEqual(sorted(stats['times']), sorted(nq.qasmast.Translation_Stats.PHASES))
+        self.assertGreaterEqual(stats['total_time'], sum(stats['times'].values()))
+
+    def test_translation_memory(self):
+        """Test memory profile of translation by section and element type."""
+        qt = nq.qasmast.QasmTranslator.fromFile(  #pylint: disable-msg=invalid-name
+            'test/qasm_src/gate_parameter_substitution.qasm', include_path=self.include_path,
+            save_pgm_source=True)
+        report = nq.profile_translate(qt)
+        self.assertGreater(report['retained'], 0)
+        self.assertGreaterEqual(report['peak'], report['retained'])
+        self.assertListEqual(sorted(report['sections']), ['c_sect', 'g_sect', 's_sect', 't_sect'])
+        self.assertEqual(report['total'], nq.translation_memory(qt.get_translation())['total'])
+        self.assertGreaterEqual(report['total'], sum(report['sections'].values()))
+        self.assertGreater(report['sections']['s_sect'], 0)
+        self.assertGreater(report['elements']['OP'], 0)
+        self.assertLessEqual(sum(report['elements'].values()), report['sections']['c_sect'])
+
+    def test_expression(self):
+        """Test parameter expressions are parsed and evaluated without eval()."""
+        evaluate = nq.qasmexpr.evaluate_expression
+        self.assertAlmostEqual(evaluate('-pi/2'), -math.pi / 2)
+        self.assertAlmostEqual(evaluate('-2^2'), -4.0)
+        self.assertAlmostEqual(evaluate('2^3^2'), 512.0)
+        self.assertAlmostEqual(evaluate('1+2*3-4/8'), 6.5)
+        self.assertAlmostEqual(evaluate('sin(pi/2)+cos(0)+tan(0)'), 2.0)
+        self.assertAlmostEqual(evaluate('ln(exp(2))*sqrt(4)'), 4.0)
+        self.assertAlmostEqual(evaluate('1.5e-1 + .5'), 0.65)
+        self.assertAlmostEqual(evaluate('lambda*phi', {'lambda': 2.0, 'phi': 0.25}), 0.5)
+        self.assertIs(nq.qasmexpr.compile_expression('pi/4'),
+                      nq.qasmexpr.compile_expression('pi/4'))
+        for bad in ('', '1+', '(1', 'pi)', '1/0', 'sqrt(-1)', 'theta', '__import__("os")'):
+            with self.assertRaises(nq.qasmexpr.ExpressionException):
+                evaluate(bad)
+
+    def test_iter_translate(self):
+        """Test streaming translation yields same elements as translate()."""
+        from_file_path = 'test/qasm_src/gate_parameter_substitution.qasm'
+        qt = nq.qasmast.QasmTranslator.fromFile(from_file_path,  #pylint: disable-msg=invalid-name
+                                                include_path=self.include_path)
+        qt.translate()
+        qt_iter = nq.qasmast.QasmTranslator.fromFile(from_file_path,
+                                                     include_path=self.include_path)
+        c_sect = []
+        g_sect = []
+        for section, entry in qt_iter.iter_translate(retain=False):
+            if section == 'c_sect':
+                c_sect.append(entry)
+            else:
+                g_sect.append(entry)
+        self.assertListEqual(c_sect, qt.get_c_sect())
+        self.assertListEqual(g_sect, qt.get_g_sect())
+        self.assertListEqual(g_sect, qt_iter.get_g_sect())
+        self.assertListEqual([], qt_iter.get_c_sect())
+
+    def test_compact_c_sect(self):
+        """Test circuit generation from compact code section."""
+        self._test_circ_qasm_file_compare('gate_parameter_substitution', compact=True)
+
+    def test_include_cache(self):
+        """Test translation spliced from include cache matches uncached."""
+        from_file_path = 'test/qasm_src/local_gate_include.qasm'
+        include_cache = nq.qasmast.Include_Cache()
+        translations = []
+        for _ in range(2):
+            qt = nq.qasmast.QasmTranslator.fromFile(from_file_path,  #pylint: disable-msg=invalid-name
+                                                    include_path=self.include_path,
+                                                    save_pgm_source=True,
+                                                    include_cache=include_cache)
+            qt.translate()
+            translation = qt.get_translation()
+            translation['t_sect']['datetime_start'] = None
+            translation['t_sect']['datetime_finish'] = None
+            translations.append(translation)
+        self.assertEqual(include_cache.hits, 2)
+        self.assertDictEqual(translations[0], translations[1])
+
+    def test_include_once(self):
+        """Test each include file is translated only once."""
+        self._test_circ_qasm_file_compare('include_once')
+        include_cache = nq.qasmast.Include_Cache()
+        for _ in range(2):
+            qt = nq.qasmast.QasmTranslator.fromFile('test/qasm_src/include_once.qasm',  #pylint: disable-msg=invalid-name
+                                                    include_path=self.include_path,
+                                                    include_cache=include_cache)
+            qt.translate()
+            gate_names = [gate['gate_name'] for gate in qt.get_g_sect()]
+            self.assertEqual(len(gate_names), len(set(gate_names)))
+            self.assertEqual(len(qt.get_filepaths()), 3)
+
+    def test_parallel_translate(self):
+        """Test translation of body in worker processes matches serial."""
+        header = ['OPENQASM 2.0;', 'include "qelib1.inc";', 'qreg q[2];', 'creg c[2];']
+        body = ['u3(0.1,0.2,{}) q[{}]; // {}'.format(i, i % 2, i) for i in range(3000)]
+        tail = ['gate k a { h a; }', 'k q[0]; k q[1];', 'cx q[0],', 'q[1];', 'measure q -> c;']
+        translations = []
+        for workers in (1, 4):
+            qt = nq.qasmast.QasmTranslator(header + body + tail,  #pylint: disable-msg=invalid-name
+                                           include_path=self.include_path,
+                                           save_element_source=True,
+                                           save_gate_source=True,
+                                           workers=workers)
+            qt.PARALLEL_CHUNK_LINES = 500
+            qt.translate()
+            translations.append(qt.get_translation())
+        self.assertListEqual(translations[0]['c_sect'], translations[1]['c_sect'])
+        self.assertListEqual(translations[0]['g_sect'], translations[1]['g_sect'])
+        for section in ('c_sect', 'g_sect'):
+            self.assertListEqual([type(entry['source']) for entry in translations[0][section]],
+                                 [type(entry['source']) for entry in translations[1][section]])
+        self.assertIsInstance(translations[1]['g_sect'][-1]['source'], nq.qasmast.Source_Span)
+        self.assertEqual(str(translations[1]['c_sect'][-3]['source']), 'k q[1];')
+        self.assertEqual(translations[1]['c_sect'][-1]['linenum'], len(header + body + tail) - 1)
+
+    def test_ast_file(self):
+        """Test binary AST record round trip and circuit from AST file."""
+        work_dir = tempfile.mkdtemp()
+        try:
+            for compact in (False, True):
+                qt = nq.qasmast.QasmTranslator.fromFile('test/qasm_src/local_gate_include.qasm',  #pylint: disable-msg=invalid-name
+                                                        include_path=self.include_path,
+                                                        compact=compact)
+                qt.translate()
+                translation = qt.get_translation()
+                ast_path = os.path.join(work_dir, 'local_gate_include.ast')
+                with open(ast_path, 'wb') as ast_file:
+                    nq.dump_ast(translation, ast_file)
+                loaded = nq.load_ast_file(ast_path)
+                self.assertListEqual(list(loaded['c_sect']), list(translation['c_sect']))
+                self.assertIs(loaded['c_sect'][0]['type'], translation['c_sect'][0]['type'])
+                self.assertEqual(nq.Ast2Circ.from_file(ast_path).translate().circuit.qasm(),
+                                 nq.Ast2Circ(nuq2_ast=translation).translate().circuit.qasm())
+            with self.assertRaises(nq.AstFileException):
+                nq.loads_ast(b'OPENQASM 2.0;')
+        finally:
+            shutil.rmtree(work_dir)
+
+    def test_ast_jsonl(self):
+        """Test JSON Lines translation output loads back the same."""
+        def translator():
+            return nq.qasmast.QasmTranslator.fromFile('test/qasm_src/local_gate_include.qasm',
+                                                      include_path=self.include_path,
+                                                      save_pgm_source=True,
+                                                      include_cache=False)
+        qt = translator()  #pylint: disable-msg=invalid-name
+        qt.translate()
+        translation = qt.get_translation()
+        out = io.StringIO()
+        nq.dump_ast_jsonl(translator(), out)
+        self.assertTrue(out.getvalue().startswith('{"section":"t_sect"'))
+        loaded = nq.load_ast_jsonl(io.StringIO(out.getvalue()))
+        self.assertListEqual(loaded['t_sect']['filepaths'], translation['t_sect']['filepaths'])
+        for section in ('c_sect', 'g_sect', 's_sect'):
+            self.assertListEqual(loaded[section], translation[section])
+
+    def test_incremental_translate(self):
+        """Test incremental retranslation matches translating each edit afresh."""
+        with open('test/qasm_src/split_statements.qasm') as qasm_file:
+            lines = qasm_file.read().split('\n')
+        session = nq.IncrementalTranslator(include_path=self.include_path)
+
+        def check(lines, last_update):
+            translation = session.update(lines)
+            qt = nq.qasmast.QasmTranslator([line.strip() for line in lines],  #pylint: disable-msg=invalid-name
+                                           include_path=self.include_path)
+            qt.translate()
+            self.assertEqual(session.last_update, last_update)
+            self.assertListEqual(translation['c_sect'], qt.get_c_sect())
+            self.assertListEqual(translation['g_sect'], qt.get_g_sect())
+
+        check(lines, 'full')
+        check(lines, 'none')
+        lines[3] = 'x q[0]; // start'
+        check(lines, 'body')
+        self.assertEqual(session.parsed, 1)
+        lines[4:4] = ['gate g a', '{', 'h a;', '}', 'g q[2];']
+        check(lines, 'body')
+        self.assertEqual(session.parsed, 2)
+        lines[7:7] = ['x a;']
+        check(lines, 'body')
+        lines.insert(1, '// header comment')
+        check(lines, 'header')
+        lines.append('barrier q;')
+        check(lines, 'body')
+        self.assertEqual(session.parsed, 1)
+        lines[-1] = 'include "cu1mol.inc";'
+        check(lines, 'full')
+
+    def test_ast_cache(self):
+        """Test on-disk AST cache hit and invalidation by changed include."""
+        work_dir = tempfile.mkdtemp()
+        try:
+            cache_dir = os.path.join(work_dir, 'cache')
+            qasm_path = os.path.join(work_dir, 'gate_parameter_substitution.qasm')
+            include_path = os.path.join(work_dir, 'cu1mol.inc')
+            shutil.copy('test/qasm_src/gate_parameter_substitution.qasm', qasm_path)
+            shutil.copy('test/qasm_src/cu1mol.inc', include_path)
+
+            def translate():
+                qt = nq.qasmast.QasmTranslator.fromFile(qasm_path,  #pylint: disable-msg=invalid-name
+                                                        include_path=work_dir,
+                                                        include_cache=False,
+                                                        cache_dir=cache_dir)
+                qt.translate()
+                return qt.get_translation()
+
+            translation = translate()
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            cached_translation = translate()
+            self.assertListEqual(cached_translation['c_sect'], translation['c_sect'])
+            self.assertListEqual(cached_translation['g_sect'], translation['g_sect'])
+
+            with open(include_path, 'a') as include_file:
+                include_file.write('gate cxmol2 a, b {\ncxmol a, b;\n}\n')
+            changed_translation = translate()
+            self.assertEqual(changed_translation['g_sect'][-1]['gate_name'], 'cxmol2')
+        finally:
+            shutil.rmtree(work_dir)